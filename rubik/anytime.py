@@ -0,0 +1,107 @@
+"""Anytime solving: a solution right away, improved until a deadline.
+
+solve() first solves the cube with the layer-by-layer Solver, which takes about a
+millisecond, so there is always a correct solution to return. It then searches for shorter
+ones with the two-phase algorithm, asking each search for a solution at least one face turn
+shorter than the best so far, until the deadline. Once the best solution is short enough for
+the optimal solver to search quickly, that solver finds a shortest one.
+
+A result is proven optimal when a search that tried every shorter length found nothing, or
+when it comes from the optimal solver. solve() loads the tables of its solvers from disk
+(see rubik.tables) before the clock starts, so a timeout does not include the time to load
+them, or on first use to build them. A deadline does: generate the tables ahead of time with
+`python -m rubik.tables generate`.
+"""
+import itertools
+import time
+from collections import namedtuple
+
+import rubik.tables
+from rubik import coord, cube, optimal, twophase, validate
+from rubik.optimize import optimize_moves
+from rubik.solve import Solver
+
+# The optimal solver usually finds a solution of up to this many face turns in seconds
+_OPTIMAL_SEARCH_LENGTH = 12
+
+
+def face_turns(moves):
+    """:return: The number of face turns in moves, counting half turns (written as two
+        quarter turns) as one"""
+    return sum(1 for _ in itertools.groupby(moves))
+
+
+class Result(namedtuple("Result", ["moves", "optimal", "method", "seconds", "budget"])):
+    """The best solution found by solve()
+
+    moves: A list of moves like Solver.moves
+    optimal: Whether no solution has fewer face turns
+    method: The solver that found moves: "solver", "two-phase" or "optimal"
+    seconds: The time solve() took
+    budget: The time solve() was given
+    """
+    __slots__ = ()
+
+    @property
+    def length(self):
+        """:return: The number of face turns in the solution, counting half turns as one"""
+        return face_turns(self.moves)
+
+    @property
+    def budget_used(self):
+        """:return: The fraction of the budget that was used, which is less than 1 if the
+            solution was proven optimal before the deadline"""
+        return min(self.seconds / self.budget, 1.0) if self.budget > 0 else 1.0
+
+
+def _load_tables():
+    """Load the tables of the solvers solve() uses, building any that are missing"""
+    for name in rubik.tables.registered():
+        if name.startswith(("solve.", "twophase.", "optimal.")):
+            rubik.tables.load(name)
+
+
+def solve(c, deadline=None, timeout=None):
+    """Find the shortest solution for the Cube c that can be found before a deadline. The
+    cube is not changed.
+
+    :param deadline: The time.monotonic() value at which to stop searching
+    :param timeout: The number of seconds to search, if no deadline is given
+    :return: A Result. Its moves are a correct solution even if the deadline has already passed.
+    :raises ValueError: If the cube can not be solved
+    :raises TypeError: If neither deadline nor timeout is given
+    """
+    if deadline is None and timeout is None:
+        raise TypeError("solve() needs a deadline or a timeout")
+    _load_tables()
+    start = time.monotonic()
+    if deadline is None:
+        deadline = start + timeout
+
+    cubies = validate.check(c)
+    solver = Solver(cube.Cube(c))
+    solver.solve()
+    best = optimize_moves(solver.moves)
+    method = "solver"
+    proven = not best
+
+    while not proven and time.monotonic() < deadline:
+        length = face_turns(best)
+        if length <= _OPTIMAL_SEARCH_LENGTH:
+            search = optimal._run(c, length - 1, deadline)
+            search_method = "optimal"
+        else:
+            search = twophase._Search(cubies, length - 1, deadline)
+            search.run()
+            search_method = "two-phase"
+        if search.solution is not None:
+            best = coord.move_names(search.solution)
+            method = search_method
+            # the optimal solver tries each length in turn, so its solution is a shortest one
+            proven = method == "optimal"
+        else:
+            # no solution shorter than best, unless the search was cut short
+            proven = not search.timed_out
+            break
+
+    return Result(best, proven, method, time.monotonic() - start, deadline - start)
@@ -0,0 +1,169 @@
+import numpy as np
+
+from rubik import cube, cubie, validate
+from rubik.cube import Cube
+
+# The facelet permutation of every move, one row per move in the order of MOVE_NAMES
+_MOVE_INDEX = {name: i for i, name in enumerate(cube.MOVE_NAMES)}
+_MOVE_ARRAY = np.array([cube.MOVE_TABLES[name] for name in cube.MOVE_NAMES], dtype=np.intp)
+
+_FACE_ARRAY = np.array(cube._FACE_FACELETS, dtype=np.intp)
+
+_CENTERS = np.array(cubie.CENTER_FACELETS, dtype=np.intp)
+_CORNER_FACELETS = np.array(cubie.CORNER_FACELETS, dtype=np.intp)
+_EDGE_FACELETS = np.array(cubie.EDGE_FACELETS, dtype=np.intp)
+_CORNER_PIECES = np.array(validate.CORNER_PIECES, dtype=np.int8)
+_CORNER_TWISTS = np.array(validate.CORNER_TWISTS, dtype=np.int8)
+_EDGE_PIECES = np.array(validate.EDGE_PIECES, dtype=np.int8)
+_EDGE_FLIPS = np.array(validate.EDGE_FLIPS, dtype=np.int8)
+
+
+def _parity(perms):
+    """:return: The parity of each row of perms"""
+    n = perms.shape[1]
+    i, j = np.triu_indices(n, 1)
+    return (perms[:, i] > perms[:, j]).sum(axis=1) % 2
+
+
+class CubeBatch:
+    """Stores N cubes as an (N, 54) array of stickers, one row per cube.
+
+    Each row holds the stickers of a cube in the order of the flat cube string (see
+    Cube.__init__) as ASCII codes, so a move is applied to every cube at once with a
+    single gather over the columns.
+    """
+
+    def __init__(self, stickers):
+        """
+        :param stickers: An (N, 54) array of ASCII sticker codes. Use from_strings() or
+            from_cubes() to build a batch from cubes.
+        """
+        stickers = np.asarray(stickers, dtype=np.uint8)
+        if stickers.ndim != 2 or stickers.shape[1] != 54:
+            raise ValueError(f"CubeBatch requires an (N, 54) array, got shape {stickers.shape}")
+        self.stickers = stickers
+
+    @classmethod
+    def from_strings(cls, cube_strs):
+        """
+        :param cube_strs: An iterable of 54 character flat cube strings (see Cube.flat_str)
+        """
+        cube_strs = list(cube_strs)
+        if any(len(s) != 54 for s in cube_strs):
+            raise ValueError("CubeBatch requires 54 character flat cube strings")
+        data = "".join(cube_strs).encode("ascii")
+        return cls(np.frombuffer(data, dtype=np.uint8).reshape(len(cube_strs), 54).copy())
+
+    @classmethod
+    def from_cubes(cls, cubes):
+        return cls.from_strings(c.flat_str() for c in cubes)
+
+    @classmethod
+    def repeat(cls, c, n):
+        """:return: A batch of n copies of the Cube c"""
+        return cls(np.tile(np.frombuffer(c.flat_str().encode("ascii"), dtype=np.uint8), (n, 1)))
+
+    def __len__(self):
+        return len(self.stickers)
+
+    def __getitem__(self, item):
+        """
+        :return: A Cube if item is an integer, or a CubeBatch for a slice, mask or index array
+        """
+        if isinstance(item, (int, np.integer)):
+            return Cube(self.stickers[item].tobytes().decode("ascii"))
+        return CubeBatch(self.stickers[item])
+
+    def copy(self):
+        return CubeBatch(self.stickers.copy())
+
+    def apply(self, name):
+        """Apply the move with the given name (e.g. "Ri") to every cube"""
+        self.stickers = self.stickers[:, cube.MOVE_TABLES[name]]
+
+    def sequence(self, move_str):
+        """Apply the moves in move_str (e.g. "L Ri U M", or a cube.Algorithm) to every cube.
+
+        The moves are composed into one permutation first, so this costs a single gather
+        no matter how long the sequence is.
+        """
+        self.stickers = self.stickers[:, cube.to_algorithm(move_str).permutation]
+
+    def apply_each(self, names):
+        """Apply a different move to each cube
+
+        :param names: A sequence of N move names, names[i] is applied to cube i. An integer
+            array of indices into cube.MOVE_NAMES is also accepted, and is faster.
+        """
+        if len(names) != len(self):
+            raise ValueError(f"Expected {len(self)} moves, got {len(names)}")
+        if not (isinstance(names, np.ndarray) and names.dtype.kind in "iu"):
+            names = [_MOVE_INDEX[name] for name in names]
+        perms = _MOVE_ARRAY[names]
+        self.stickers = np.take_along_axis(self.stickers, perms, axis=1)
+
+    def is_solved(self):
+        """
+        :return: A boolean array, True for each cube that is solved
+        """
+        faces = self.stickers[:, _FACE_ARRAY]
+        return (faces == faces[:, :, :1]).all(axis=(1, 2))
+
+    def validate(self):
+        """Check which cubes can be solved, like rubik.validate.validate()
+
+        :return: A uint8 array with the rubik.validate.Reason of each cube, 0 (Reason.OK)
+            for each cube that can be solved
+        """
+        stickers = self.stickers
+        centers = stickers[:, _CENTERS]
+        sorted_centers = np.sort(centers, axis=1)
+        distinct_centers = (sorted_centers[:, 1:] != sorted_centers[:, :-1]).all(axis=1)
+        # the face of each sticker, by the center with the same color
+        matches = stickers[:, :, None] == centers[:, None, :]
+        counts_ok = (matches.sum(axis=1) == 9).all(axis=1)
+        faces = matches.argmax(axis=2)
+
+        corner_faces = faces[:, _CORNER_FACELETS]
+        corner_keys = (corner_faces[:, :, 0] * 6 + corner_faces[:, :, 1]) * 6 + corner_faces[:, :, 2]
+        cp, co = _CORNER_PIECES[corner_keys], _CORNER_TWISTS[corner_keys]
+        edge_faces = faces[:, _EDGE_FACELETS]
+        edge_keys = edge_faces[:, :, 0] * 6 + edge_faces[:, :, 1]
+        ep, eo = _EDGE_PIECES[edge_keys], _EDGE_FLIPS[edge_keys]
+
+        unique = ((np.sort(cp, axis=1) == np.arange(8)).all(axis=1)
+                  & (np.sort(ep, axis=1) == np.arange(12)).all(axis=1))
+        Reason = validate.Reason
+        return np.select(
+            [~distinct_centers, ~counts_ok, (cp < 0).any(axis=1), (ep < 0).any(axis=1), ~unique,
+             co.sum(axis=1) % 3 != 0, eo.sum(axis=1) % 2 != 0, _parity(cp) != _parity(ep)],
+            [Reason.CENTERS, Reason.STICKER_COUNTS, Reason.INVALID_CORNER, Reason.INVALID_EDGE,
+             Reason.DUPLICATE_PIECE, Reason.CORNER_TWIST, Reason.EDGE_FLIP, Reason.PARITY],
+            Reason.OK).astype(np.uint8)
+
+    def equals(self, other):
+        """
+        :param other: A CubeBatch of the same length, or a single Cube to compare every cube with
+        :return: A boolean array, True for each cube equal to its counterpart in other
+        """
+        if isinstance(other, Cube):
+            other = np.frombuffer(other.flat_str().encode("ascii"), dtype=np.uint8)
+        else:
+            other = other.stickers
+        return (self.stickers == other).all(axis=1)
+
+    def flat_strs(self):
+        """
+        :return: A list with the flat cube string of each cube
+        """
+        data = self.stickers.tobytes().decode("ascii")
+        return [data[i:i + 54] for i in range(0, len(data), 54)]
+
+    def strs(self):
+        """
+        :return: A list with the string of each cube, as given by str(Cube)
+        """
+        return [cube._format_net(s) for s in self.flat_strs()]
+
+    def to_cubes(self):
+        return [Cube(s) for s in self.flat_strs()]
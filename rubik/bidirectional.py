@@ -0,0 +1,186 @@
+"""A bidirectional (meet-in-the-middle) solver for cubes that are a few moves from solved.
+
+The solver runs a breadth-first search from the cube and another from the solved cube, one
+layer at a time, always growing the side with the smaller frontier, until they meet. Each
+search reaches about half the depth of the solution, so a cube 10 face turns from solved is
+solved after visiting a few hundred thousand states from each side rather than billions.
+
+A state is described exactly by the corner permutation, the corner twist, and the positions
+and flips of the middle layer edges of each axis (see rubik.coord.AXIS_ROTATIONS), packed
+into one integer key. The solutions have the fewest face turns, counting half turns as one.
+"""
+import rubik.optimal  # registers the move tables used here
+import rubik.tables
+from rubik import coord, validate
+from rubik.solve import Solver
+
+_N = len(coord.MOVES)
+
+# The face (0 to 5 for U, R, F, D, L, B) of each move in MOVES
+_FACE = tuple(m // 3 for m in range(_N))
+
+# The index of the inverse of each move in MOVES
+_INVERSE = tuple(m - m % 3 + 2 - m % 3 for m in range(_N))
+
+# Each move with the moves that have the same effect on the cube seen along the other two
+# axes, and its face
+_MOVE_INFO = tuple(zip(range(_N), coord.AXIS_MOVES[1], coord.AXIS_MOVES[2], _FACE))
+
+_TWIST_SIZE = coord.TWIST.size
+_EDGES_SIZE = coord.SLICE_EDGE_SUBSET.size
+
+
+def _pack(state):
+    corners, twist, e0, e1, e2 = state
+    return (((corners * _TWIST_SIZE + twist) * _EDGES_SIZE + e0) * _EDGES_SIZE + e1) * _EDGES_SIZE + e2
+
+
+def _unpack(key):
+    key, e2 = divmod(key, _EDGES_SIZE)
+    key, e1 = divmod(key, _EDGES_SIZE)
+    key, e0 = divmod(key, _EDGES_SIZE)
+    corners, twist = divmod(key, _TWIST_SIZE)
+    return corners, twist, e0, e1, e2
+
+
+class _Side:
+    """One of the two searches"""
+
+    def __init__(self, state):
+        # the last move to each state seen, as an index into MOVES
+        self.seen = {_pack(state): -1}
+        self.frontier = [(state, -1)]
+        self.depth = 0
+
+
+class _Search:
+
+    def __init__(self, state, max_depth, max_states):
+        load = rubik.tables.load
+        self.corners_move = load("optimal.corners_move")
+        self.twist_move = load("twophase.twist_move")
+        self.edges_move = load("optimal.slice_edge_subset_move")
+        self.start = _Side(state)
+        self.goal = _Side((0, 0, 0, 0, 0))
+        self.max_depth = max_depth
+        self.max_states = max_states
+
+    def _move(self, state, m):
+        corners, twist, e0, e1, e2 = state
+        edges_move = self.edges_move
+        return (self.corners_move[corners * _N + m], self.twist_move[twist * _N + m],
+                edges_move[e0 * _N + m],
+                edges_move[e1 * _N + coord.AXIS_MOVES[1][m]],
+                edges_move[e2 * _N + coord.AXIS_MOVES[2][m]])
+
+    def run(self):
+        """:return: A list of indices into MOVES, or None if the sides did not meet"""
+        start, goal = self.start, self.goal
+        key = next(iter(start.seen))
+        if key in goal.seen:
+            return []
+        while start.depth + goal.depth < self.max_depth:
+            if len(start.seen) + len(goal.seen) > self.max_states:
+                return None
+            if len(start.frontier) <= len(goal.frontier):
+                key = self._expand(start, goal)
+            else:
+                key = self._expand(goal, start)
+            if key is not None:
+                return self._path(start, key) + [_INVERSE[m] for m in reversed(self._path(goal, key))]
+        return None
+
+    def _expand(self, side, other):
+        """Add the next layer to side
+
+        :return: The key of a state seen by both sides, or None
+        """
+        side.depth += 1
+        seen = side.seen
+        other_seen = other.seen
+        corners_move, twist_move, edges_move = self.corners_move, self.twist_move, self.edges_move
+        frontier = []
+        for (corners, twist, e0, e1, e2), last_face in side.frontier:
+            corners *= _N
+            twist *= _N
+            e0 *= _N
+            e1 *= _N
+            e2 *= _N
+            for m, m1, m2, face in _MOVE_INFO:
+                if face == last_face or face + 3 == last_face:
+                    continue
+                child = (corners_move[corners + m], twist_move[twist + m],
+                         edges_move[e0 + m], edges_move[e1 + m1], edges_move[e2 + m2])
+                key = _pack(child)
+                if key in seen:
+                    continue
+                seen[key] = m
+                if key in other_seen:
+                    # every shorter meeting would have been found in an earlier layer
+                    return key
+                frontier.append((child, face))
+        side.frontier = frontier
+        return None
+
+    def _path(self, side, key):
+        """:return: The moves from the first state of side to the state with the given key"""
+        path = []
+        m = side.seen[key]
+        while m >= 0:
+            path.append(m)
+            key = _pack(self._move(_unpack(key), _INVERSE[m]))
+            m = side.seen[key]
+        path.reverse()
+        return path
+
+
+def solve(c, max_depth=10, max_states=3000000):
+    """Find a shortest solution for the Cube c, if it is close to solved. The cube is not changed.
+
+    :param max_depth: The maximum number of face turns (counting half turns as one) to search
+    :param max_states: The maximum number of states to keep, which bounds the memory used.
+        A depth of 10 needs roughly a million.
+    :return: A list of moves like Solver.moves, with half turns written as two quarter turns,
+        or None if no solution was found within max_depth moves and max_states states
+    :raises ValueError: If the cube can not be solved
+    """
+    validate.check(c)
+    cubies_by_axis = coord.axis_cubies(c)
+    state = (coord.CORNERS.get(cubies_by_axis[0]), coord.TWIST.get(cubies_by_axis[0]),
+             *(coord.SLICE_EDGE_SUBSET.get(cubies) for cubies in cubies_by_axis))
+    solution = _Search(state, max_depth, max_states).run()
+    if solution is None:
+        return None
+    return coord.move_names(solution)
+
+
+class BidirectionalSolver:
+    """Solves cubes that are close to solved with the fewest face turns, and other cubes
+    with a fallback solver"""
+
+    def __init__(self, c, max_depth=10, max_states=3000000, fallback=Solver):
+        """
+        :param max_depth: The maximum number of face turns to search
+        :param max_states: The maximum number of states the search may keep
+        :param fallback: A solver class, like Solver or TwoPhaseSolver, to use when no
+            solution is found within max_depth moves
+        """
+        self.cube = c
+        self.max_depth = max_depth
+        self.max_states = max_states
+        self.fallback = fallback
+        self.moves = []
+        self.used_fallback = False
+
+    def solve(self):
+        """Solve the cube and record the solution in self.moves. self.used_fallback is set
+        to whether the fallback solver was used."""
+        moves = solve(self.cube, self.max_depth, self.max_states)
+        self.used_fallback = moves is None
+        if moves is None:
+            solver = self.fallback(self.cube)
+            solver.solve()
+            self.moves = solver.moves
+        else:
+            self.moves = moves
+            self.cube.sequence(" ".join(moves))
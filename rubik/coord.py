@@ -0,0 +1,339 @@
+"""Integer coordinates of cube states, and move tables over them.
+
+A coordinate describes one aspect of the cubie level state of a cube (see rubik.cubie),
+e.g. the twist of all corners, as an integer in range(size). A move table gives the
+coordinate after each move for every coordinate value, so a search over coordinates never
+has to build a cube.
+"""
+import itertools
+import operator
+from array import array
+from collections import namedtuple
+from math import factorial
+
+from rubik import cube, cubie
+
+# The face turns move tables are built for: each of U, R, F, D, L, B turned clockwise by a
+# quarter turn, a half turn and a three quarter turn. Each is one of cube.MOVE_NAMES.
+MOVES = tuple(m for face in "URFDLB" for m in (face, face + "2", face + "i"))
+
+# The moves that keep a cube in the group <U, D, R2, L2, F2, B2>, as indices into MOVES
+PHASE2_MOVES = tuple(i for i, m in enumerate(MOVES) if m[0] in "UD" or m.endswith("2"))
+
+# All the moves, as indices into MOVES
+_ALL_MOVES = tuple(range(len(MOVES)))
+
+# The names of each move in MOVES, with a half turn written as two quarter turns
+_QUARTER_TURN_NAMES = tuple((m[0], m[0]) if m.endswith("2") else (m,) for m in MOVES)
+
+
+def move_names(moves):
+    """
+    :param moves: Indices into MOVES, such as the solution of a search over coordinates
+    :return: The list of their move names, with half turns written as two quarter turns like
+        rubik.solve.Solver.moves
+    """
+    return [name for m in moves for name in _QUARTER_TURN_NAMES[m]]
+
+
+def _move_cubies(name):
+    return cubie.from_facelets(cube.apply_permutation(cubie.FACELET_FACES, cube.MOVE_TABLES[name]))[1]
+
+
+# The cubies (cp, co, ep, eo) of a solved cube after each move
+MOVE_CUBIES = tuple(_move_cubies(m) for m in MOVES)
+
+# Whole cube rotations that turn the U-D, L-R and F-B axes into the U-D axis. Looking at a
+# cube after each of them lets a coordinate of the U-D axis (e.g. SLICE) describe all three.
+AXIS_ROTATIONS = ("", "Z", "X")
+
+
+def _axis_moves(rotation):
+    if not rotation:
+        return _ALL_MOVES
+    perms = [cube.MOVE_TABLES[m] for m in MOVES]
+    turn = cube.MOVE_TABLES[rotation]
+    return tuple(perms.index(cube.compose_permutations(cube.invert_permutation(turn), perm, turn))
+                 for perm in perms)
+
+
+# For each of AXIS_ROTATIONS, the index of the move that has the same effect on the rotated
+# cube as each move in MOVES has on the cube
+AXIS_MOVES = tuple(_axis_moves(rotation) for rotation in AXIS_ROTATIONS)
+
+
+def axis_cubies(c):
+    """
+    :param c: A Cube
+    :return: The cubies (cp, co, ep, eo) of the cube after each of AXIS_ROTATIONS
+    """
+    cube_str = c.flat_str()
+    return [cubie.from_facelets(cube.apply_permutation(cube_str, cube.MOVE_TABLES[rotation]) if rotation
+                                else cube_str)[1]
+            for rotation in AXIS_ROTATIONS]
+
+
+def _binomial(n, k):
+    if k > n:
+        return 0
+    result = 1
+    for i in range(k):
+        result = result * (n - i) // (i + 1)
+    return result
+
+
+def _digits_get(digits, base):
+    value = 0
+    for x in digits:
+        value = value * base + x
+    return value
+
+
+def _digits_set(value, base, n):
+    digits = [0] * n
+    for i in reversed(range(n)):
+        value, digits[i] = divmod(value, base)
+    return digits
+
+
+def _twist_get(cubies):
+    return _digits_get(cubies[1][:7], 3)
+
+
+def _twist_set(value):
+    co = _digits_set(value, 3, 7)
+    co.append(-sum(co) % 3)
+    return tuple(range(8)), tuple(co), tuple(range(12)), (0,) * 12
+
+
+def _flip_get(cubies):
+    return _digits_get(cubies[3][:11], 2)
+
+
+def _flip_set(value):
+    eo = _digits_set(value, 2, 11)
+    eo.append(sum(eo) % 2)
+    return tuple(range(8)), (0,) * 8, tuple(range(12)), tuple(eo)
+
+
+def _slice_get(cubies):
+    # rank the positions of the FR, FL, BL and BR edges, counted from the back of the edge
+    # list, in the combinatorial number system. 0 means they are all in the middle layer.
+    positions = sorted(11 - i for i, e in enumerate(cubies[2]) if e >= 8)
+    return sum(_binomial(p, k + 1) for k, p in enumerate(positions))
+
+
+def _slice_set(value):
+    positions = set()
+    for k in range(4, 0, -1):
+        p = k - 1
+        while _binomial(p + 1, k) <= value:
+            p += 1
+        value -= _binomial(p, k)
+        positions.add(11 - p)
+    slice_edges, other_edges = iter(range(8, 12)), iter(range(8))
+    ep = tuple(next(slice_edges) if i in positions else next(other_edges) for i in range(12))
+    return tuple(range(8)), (0,) * 8, ep, (0,) * 12
+
+
+class Coordinate:
+    """An integer coordinate of the cubie level state of a cube, in range(size)"""
+
+    def __init__(self, name, size, get, set, corners):
+        """
+        :param get: A function mapping cubies (cp, co, ep, eo) to the coordinate
+        :param set: A function mapping a coordinate to cubies that have it, with everything
+            the coordinate does not describe left solved
+        :param corners: True if the coordinate only depends on the corners, False if it only
+            depends on the edges
+        """
+        self.name = name
+        self.size = size
+        self.get = get
+        self.set = set
+        self.corners = corners
+
+    def __repr__(self):
+        return f"Coordinate({self.name!r}, {self.size})"
+
+    def move_table(self, moves=_ALL_MOVES):
+        """
+        :param moves: The indices into MOVES to build the table for
+        :return: An array t where t[i * len(moves) + k] is the coordinate of a cube with
+            coordinate i after the move MOVES[moves[k]]
+        """
+        table = array("I" if self.size > 0xffff else "H", bytes(0))
+        if self.corners:
+            move_parts = [m[:2] for m in (MOVE_CUBIES[k] for k in moves)]
+        else:
+            move_parts = [m[2:] for m in (MOVE_CUBIES[k] for k in moves)]
+
+        for i in range(self.size):
+            state = self.set(i)
+            if self.corners:
+                edges = state[2:]
+                table.extend(self.get(cubie.multiply_corners(state[:2], m) + edges) for m in move_parts)
+            else:
+                corners = state[:2]
+                table.extend(self.get(corners + cubie.multiply_edges(state[2:], m)) for m in move_parts)
+        return table
+
+
+class _PermutationCoordinate(Coordinate):
+    """The rank of the permutation of a range of the corner or edge positions"""
+
+    def __init__(self, name, corners, start, stop):
+        """
+        :param start: The first position of the range
+        :param stop: The position after the last position of the range. The range must hold
+            the pieces that belong in it, and the moves of move_table() must keep them there.
+        """
+        part = 0 if corners else 2
+        n = stop - start
+
+        def get(cubies):
+            return cubie.permutation_rank([x - start for x in cubies[part][start:stop]])
+
+        def set(value):
+            state = [tuple(range(8)), (0,) * 8, tuple(range(12)), (0,) * 12]
+            perm = state[part]
+            state[part] = perm[:start] + tuple(x + start for x in cubie.permutation_unrank(value, n)) + perm[stop:]
+            return tuple(state)
+
+        super().__init__(name, factorial(n), get, set, corners)
+        self.part = part
+        self.start = start
+        self.stop = stop
+
+    def move_table(self, moves=_ALL_MOVES):
+        # itertools.permutations() gives the permutations in order of their rank
+        n = self.stop - self.start
+        perms = list(itertools.permutations(range(n)))
+        rank = {perm: i for i, perm in enumerate(perms)}
+        movers = [operator.itemgetter(*(x - self.start for x in MOVE_CUBIES[k][self.part][self.start:self.stop]))
+                  for k in moves]
+        return array("I" if self.size > 0xffff else "H", (rank[move(perm)] for perm in perms for move in movers))
+
+
+class _SubsetCoordinate(Coordinate):
+    """The positions and orientations of a range of the corners or of the edges"""
+
+    def __init__(self, name, corners, start, stop):
+        """
+        :param start: The first piece of the range
+        :param stop: The piece after the last piece of the range
+        """
+        part = 0 if corners else 2
+        slots = 8 if corners else 12
+        base = 3 if corners else 2
+        n = stop - start
+        # positions are counted from start, so that the coordinate is 0 when the pieces are solved
+        positions = list(itertools.permutations(range(slots), n))
+        rank = {p: i for i, p in enumerate(positions)}
+        orientations = base ** n
+
+        def get(cubies):
+            perm, ori = cubies[part], cubies[part + 1]
+            where = [0] * n
+            for i, piece in enumerate(perm):
+                if start <= piece < stop:
+                    where[piece - start] = i
+            return (rank[tuple((i - start) % slots for i in where)] * orientations
+                    + _digits_get((ori[i] for i in where), base))
+
+        def set(value):
+            position, ori = divmod(value, orientations)
+            perm, oris = [None] * slots, [0] * slots
+            for piece, (p, o) in enumerate(zip(positions[position], _digits_set(ori, base, n))):
+                perm[(p + start) % slots] = piece + start
+                oris[(p + start) % slots] = o
+            others = iter(piece for piece in range(slots) if not start <= piece < stop)
+            perm = tuple(next(others) if piece is None else piece for piece in perm)
+            state = list(cubie.SOLVED)
+            state[part], state[part + 1] = perm, tuple(oris)
+            return tuple(state)
+
+        super().__init__(name, len(positions) * orientations, get, set, corners)
+        self.part = part
+        self.start = start
+        self.stop = stop
+        self._slots = slots
+        self._base = base
+        self._positions = positions
+        self._rank = rank
+
+    def move_table(self, moves=_ALL_MOVES):
+        slots, start, base, n = self._slots, self.start, self._base, self.stop - self.start
+        orientations = base ** n
+        # for each move, the position each position goes to, and the orientation a piece
+        # there gains, with positions counted from start
+        steps = []
+        for k in moves:
+            perm, ori = MOVE_CUBIES[k][self.part:self.part + 2]
+            inverse = cube.invert_permutation(perm)
+            steps.append((
+                [(inverse[(p + start) % slots] - start) % slots for p in range(slots)],
+                [ori[inverse[(p + start) % slots]] for p in range(slots)],
+            ))
+
+        ori_digits = [_digits_set(o, base, n) for o in range(orientations)]
+        ori_maps = {}
+        table = array("I" if self.size > 0xffff else "H")
+        for positions in self._positions:
+            row = []
+            for new_position, gained in steps:
+                offset = self._rank[tuple(new_position[p] for p in positions)] * orientations
+                gain = tuple(gained[p] for p in positions)
+                ori_map = ori_maps.get(gain)
+                if ori_map is None:
+                    ori_map = ori_maps[gain] = [
+                        _digits_get(((x + g) % base for x, g in zip(digits, gain)), base) for digits in ori_digits]
+                row.append((offset, ori_map))
+            for o in range(orientations):
+                table.extend(offset + ori_map[o] for offset, ori_map in row)
+        return table
+
+
+# The orientation of the corners
+TWIST = Coordinate("twist", 3 ** 7, _twist_get, _twist_set, corners=True)
+# The orientation of the edges
+FLIP = Coordinate("flip", 2 ** 11, _flip_get, _flip_set, corners=False)
+# The positions of the four middle layer (UD-slice) edges, ignoring their order
+SLICE = Coordinate("slice", _binomial(12, 4), _slice_get, _slice_set, corners=False)
+# The permutation of the corners
+CORNERS = _PermutationCoordinate("corners", True, 0, 8)
+# The permutation of all edges. There are too many values to build a move table.
+EDGES = _PermutationCoordinate("edges", False, 0, 12)
+# The permutation of the edges of the U and D faces. Only defined when those edges are all
+# in the U and D faces, which the moves in PHASE2_MOVES preserve.
+UD_EDGES = _PermutationCoordinate("ud_edges", False, 0, 8)
+# The permutation of the middle layer edges. Only defined when they are all in the middle
+# layer, which the moves in PHASE2_MOVES preserve.
+SLICE_EDGES = _PermutationCoordinate("slice_edges", False, 8, 12)
+# The positions and twists of the corners of the U face
+U_CORNER_SUBSET = _SubsetCoordinate("u_corner_subset", True, 0, 4)
+# The positions and flips of the middle layer edges
+SLICE_EDGE_SUBSET = _SubsetCoordinate("slice_edge_subset", False, 8, 12)
+
+Coordinates = namedtuple("Coordinates", "twist flip slice corners edges")
+
+
+def coordinates(c):
+    """
+    :param c: A Cube
+    :return: The Coordinates of the cube, relative to its centers
+    """
+    cubies = cubie.from_facelets(c.flat_str())[1]
+    return Coordinates(*(coord.get(cubies) for coord in (TWIST, FLIP, SLICE, CORNERS, EDGES)))
+
+
+def to_cube(twist=0, flip=0, corners=0, edges=0, centers="ULFRBD"):
+    """
+    :param centers: The center colors, in the order U, L, F, R, B, D
+    :return: A Cube with the given coordinates
+    """
+    cp = CORNERS.set(corners)[0]
+    co = TWIST.set(twist)[1]
+    ep = EDGES.set(edges)[2]
+    eo = FLIP.set(flip)[3]
+    return cube.Cube("".join(cubie.to_facelets(centers, (cp, co, ep, eo))))
@@ -1,5 +1,10 @@
+import functools
+import hashlib
+import itertools
+import operator
 import string
 
+from rubik import encoding
 from rubik.maths import Point, Matrix
 
 RIGHT = X_AXIS = Point(1, 0, 0)
@@ -105,24 +110,380 @@ class Piece:
         self.colors[i], self.colors[j] = self.colors[j], self.colors[i]
 
 
+# The 26 pieces of the cube as (position, facelets) pairs. facelets gives, for each axis
+# (x, y, z), the index in the 54 character cube string of the sticker facing along that
+# axis, or None if the piece has no sticker on that axis.
+_SLOTS = (
+    (RIGHT, (28, None, None)),
+    (LEFT,  (22, None, None)),
+    (UP,    (None, 4,  None)),
+    (DOWN,  (None, 49, None)),
+    (FRONT, (None, None, 25)),
+    (BACK,  (None, None, 31)),
+    (RIGHT + UP,    (16, 5, None)),
+    (RIGHT + DOWN,  (40, 50, None)),
+    (RIGHT + FRONT, (27, None, 26)),
+    (RIGHT + BACK,  (29, None, 30)),
+    (LEFT + UP,     (10, 3, None)),
+    (LEFT + DOWN,   (34, 48, None)),
+    (LEFT + FRONT,  (23, None, 24)),
+    (LEFT + BACK,   (21, None, 32)),
+    (UP + FRONT,    (None, 7, 13)),
+    (UP + BACK,     (None, 1, 19)),
+    (DOWN + FRONT,  (None, 46, 37)),
+    (DOWN + BACK,   (None, 52, 43)),
+    (RIGHT + UP + FRONT,   (15, 8, 14)),
+    (RIGHT + UP + BACK,    (17, 2, 18)),
+    (RIGHT + DOWN + FRONT, (39, 47, 38)),
+    (RIGHT + DOWN + BACK,  (41, 53, 42)),
+    (LEFT + UP + FRONT,    (11, 6, 12)),
+    (LEFT + UP + BACK,     (9, 0, 20)),
+    (LEFT + DOWN + FRONT,  (35, 45, 36)),
+    (LEFT + DOWN + BACK,   (33, 51, 44)),
+)
+
+# For each facelet, the index into _SLOTS of the piece it belongs to
+_FACELET_SLOT = [None] * 54
+for _slot, (_, _facelets) in enumerate(_SLOTS):
+    for _f in _facelets:
+        if _f is not None:
+            _FACELET_SLOT[_f] = _slot
+_FACELET_SLOT = tuple(_FACELET_SLOT)
+
+# The index into _SLOTS of the piece at each (x, y, z) position
+_SLOT_AT = {tuple(pos): slot for slot, (pos, _) in enumerate(_SLOTS)}
+
+# For each piece, one facelet the piece has a sticker on
+_SLOT_FACELET = tuple(next(f for f in facelets if f is not None) for _, facelets in _SLOTS)
+
+# The facelets of each face, in the order they appear in the cube string
+_FACE_FACELETS = (
+    tuple(range(9)),                                               # UP
+    tuple(9 + 12 * row + col for row in range(3) for col in range(3)),   # LEFT
+    tuple(12 + 12 * row + col for row in range(3) for col in range(3)),  # FRONT
+    tuple(15 + 12 * row + col for row in range(3) for col in range(3)),  # RIGHT
+    tuple(18 + 12 * row + col for row in range(3) for col in range(3)),  # BACK
+    tuple(range(45, 54)),                                          # DOWN
+)
+
+
+def _face(axis):
+    """:return: A predicate selecting the positions on the face given by axis"""
+    assert axis.count(0) == 2
+    return lambda pos: pos.dot(axis) > 0
+
+
+def _slice(plane):
+    """:return: A predicate selecting the positions in the given plane (e.g. X_AXIS + Y_AXIS)"""
+    assert plane.count(0) == 1
+    i = next((i for i, x in enumerate(plane) if x == 0))
+    return lambda pos: pos[i] == 0
+
+
+def _whole_cube(pos):
+    return True
+
+
+def _move_permutation(select, matrix):
+    """Derive the facelet permutation of a move by rotating labelled pieces.
+
+    :param select: A predicate choosing the positions of the pieces that are turned
+    :param matrix: The rotation matrix applied to the chosen pieces
+    :return: A tuple perm of length 54 such that after the move, facelet i holds the
+        sticker previously at facelet perm[i]
+    """
+    pieces = [Piece(pos=pos, colors=facelets) for pos, facelets in _SLOTS]
+    for piece in pieces:
+        if select(piece.pos):
+            piece.rotate(matrix)
+
+    facelets_at = {tuple(pos): facelets for pos, facelets in _SLOTS}
+    perm = [None] * 54
+    for piece in pieces:
+        for dst, src in zip(facelets_at[tuple(piece.pos)], piece.colors):
+            if dst is not None:
+                perm[dst] = src
+    return tuple(perm)
+
+
+# Rubik's Cube Notation: http://ruwix.com/the-rubiks-cube/notation/
+_MOVE_DEFS = (
+    ("L",  _face(LEFT), ROT_YZ_CC),
+    ("Li", _face(LEFT), ROT_YZ_CW),
+    ("R",  _face(RIGHT), ROT_YZ_CW),
+    ("Ri", _face(RIGHT), ROT_YZ_CC),
+    ("U",  _face(UP), ROT_XZ_CW),
+    ("Ui", _face(UP), ROT_XZ_CC),
+    ("D",  _face(DOWN), ROT_XZ_CC),
+    ("Di", _face(DOWN), ROT_XZ_CW),
+    ("F",  _face(FRONT), ROT_XY_CW),
+    ("Fi", _face(FRONT), ROT_XY_CC),
+    ("B",  _face(BACK), ROT_XY_CC),
+    ("Bi", _face(BACK), ROT_XY_CW),
+    ("M",  _slice(Y_AXIS + Z_AXIS), ROT_YZ_CC),
+    ("Mi", _slice(Y_AXIS + Z_AXIS), ROT_YZ_CW),
+    ("E",  _slice(X_AXIS + Z_AXIS), ROT_XZ_CC),
+    ("Ei", _slice(X_AXIS + Z_AXIS), ROT_XZ_CW),
+    ("S",  _slice(X_AXIS + Y_AXIS), ROT_XY_CW),
+    ("Si", _slice(X_AXIS + Y_AXIS), ROT_XY_CC),
+    ("X",  _whole_cube, ROT_YZ_CW),
+    ("Xi", _whole_cube, ROT_YZ_CC),
+    ("Y",  _whole_cube, ROT_XZ_CW),
+    ("Yi", _whole_cube, ROT_XZ_CC),
+    ("Z",  _whole_cube, ROT_XY_CW),
+    ("Zi", _whole_cube, ROT_XY_CC),
+)
+
+# The quarter turns of _MOVE_DEFS as half turns, e.g. "R2" for "R R"
+_HALF_TURNS = tuple(name + "2" for name, _, _ in _MOVE_DEFS if not name.endswith("i"))
+
+# The names of all moves: the quarter turns in the order of _MOVE_DEFS, then the half turns
+MOVE_NAMES = tuple(name for name, _, _ in _MOVE_DEFS) + _HALF_TURNS
+
+# The facelet permutation of each move, keyed by move name. Facelets are numbered as in the
+# cube string (see Cube.__init__). After a move, facelet i holds the sticker that was on
+# facelet MOVE_TABLES[name][i], so any per-facelet state (a list of colors, a flat cube
+# string, a row of a numpy array) is moved with a single gather: [state[j] for j in perm].
+MOVE_TABLES = {name: _move_permutation(select, matrix) for name, select, matrix in _MOVE_DEFS}
+MOVE_TABLES.update((name, tuple(MOVE_TABLES[name[0]][i] for i in MOVE_TABLES[name[0]])) for name in _HALF_TURNS)
+
+# The name in MOVE_NAMES of each move name, including those in standard notation (R' for Ri,
+# and R2' for R2)
+_MOVE_NAME = {name: name for name in MOVE_NAMES}
+_MOVE_NAME.update((name[0] + "'", name) for name in MOVE_NAMES if name.endswith("i"))
+_MOVE_NAME.update((name + "'", name) for name in _HALF_TURNS)
+
+# Each move as a callable that maps a state tuple to the state tuple after the move
+_MOVES = {name: operator.itemgetter(*perm) for name, perm in MOVE_TABLES.items()}
+
+# The facelets whose sticker is changed by each move
+_MOVE_FACELETS = {name: tuple(i for i, j in enumerate(perm) if i != j) for name, perm in MOVE_TABLES.items()}
+
+
+def _zobrist_key(facelet, color):
+    """:return: A random 64 bit key for the given color on the given facelet, stable across processes"""
+    digest = hashlib.blake2b(f"{facelet}:{color}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+@functools.lru_cache(maxsize=64)
+def _zobrist_keys(stickers):
+    """
+    :param stickers: The color of each sticker id of a cube
+    :return: keys such that keys[f][s] is the Zobrist key of sticker s on facelet f
+    """
+    by_color = {color: [_zobrist_key(f, color) for f in range(54)] for color in set(stickers)}
+    return tuple(tuple(by_color[color][f] for color in stickers) for f in range(54))
+
+
+def apply_permutation(state, perm):
+    """
+    :param state: A sequence with one item per facelet, e.g. a flat cube string
+    :param perm: A facelet permutation such as MOVE_TABLES['R']
+    :return: A tuple of the items of state after the permutation is applied
+    """
+    return tuple(state[i] for i in perm)
+
+
+def compose_permutations(*perms):
+    """
+    :return: A single permutation equivalent to applying each of perms in order
+    """
+    result = tuple(range(54))
+    for perm in perms:
+        result = tuple(result[i] for i in perm)
+    return result
+
+
+def invert_permutation(perm):
+    """
+    :return: The permutation that undoes perm
+    """
+    result = [None] * len(perm)
+    for i, j in enumerate(perm):
+        result[j] = i
+    return tuple(result)
+
+
+def standard_notation(moves):
+    """
+    :param moves: A sequence of move names, e.g. Solver.moves
+    :return: A list of the moves in standard notation: R' for Ri, and R2 for a half turn
+    """
+    return [name[0] + "'" if name.endswith("i") else name for name in moves]
+
+
+# Each move as a callable that maps a state tuple to the state tuple before the move
+_UNDO_MOVES = {name: operator.itemgetter(*invert_permutation(perm)) for name, perm in MOVE_TABLES.items()}
+
+
+_IDENTITY = tuple(range(54))
+
+
+class Algorithm:
+    """A sequence of moves that is parsed once, with its moves composed into a single
+    permutation, so applying it to a Cube takes one step however many moves it has.
+    Cube.sequence(), Solver.move() and CubeBatch.sequence() accept an Algorithm anywhere
+    they accept a move string.
+    """
+
+    def __init__(self, moves):
+        """
+        :param moves: A string of moves separated by spaces, e.g. "R U Ri Ui" or "R U2 R'",
+            or a sequence of move names. Moves in standard notation are stored by their
+            names in MOVE_NAMES, e.g. R' as Ri.
+        :raises ValueError: If a move name is not one of MOVE_NAMES or in standard notation
+        """
+        if isinstance(moves, str):
+            moves = moves.split()
+        unknown = [name for name in moves if name not in _MOVE_NAME]
+        if unknown:
+            raise ValueError(f"Unknown moves: {' '.join(unknown)}")
+        moves = tuple(_MOVE_NAME[name] for name in moves)
+        # applying the moves to the identity permutation composes them
+        permutation = _IDENTITY
+        for name in moves:
+            permutation = _MOVES[name](permutation)
+        self._set(moves, permutation)
+
+    def _set(self, moves, permutation):
+        self.moves = moves
+        self._hash = hash(moves)
+        self.permutation = permutation
+        self._getter = operator.itemgetter(*permutation)
+        self._facelets = tuple(i for i, j in enumerate(permutation) if i != j)
+
+    def __str__(self):
+        return " ".join(self.moves)
+
+    def __repr__(self):
+        return f"Algorithm({str(self)!r})"
+
+    def __len__(self):
+        return len(self.moves)
+
+    def __iter__(self):
+        return iter(self.moves)
+
+    def __eq__(self, other):
+        return isinstance(other, Algorithm) and self.moves == other.moves
+
+    def __hash__(self):
+        return self._hash
+
+    def __add__(self, other):
+        """:return: The Algorithm of this one followed by other, an Algorithm or a move string"""
+        other = to_algorithm(other)
+        result = Algorithm.__new__(Algorithm)
+        result._set(self.moves + other.moves, other._getter(self.permutation))
+        return result
+
+    def __radd__(self, other):
+        return to_algorithm(other) + self
+
+
+@functools.lru_cache(maxsize=256)
+def _parse_algorithm(move_str):
+    return Algorithm(move_str)
+
+
+def to_algorithm(moves):
+    """
+    :param moves: An Algorithm or a move string
+    :return: An Algorithm. Each distinct move string is only parsed once.
+    """
+    return moves if isinstance(moves, Algorithm) else _parse_algorithm(moves)
+
+
+class _CubePiece(Piece):
+    """A Piece of a Cube.
+
+    The position and colors are looked up in the sticker state of the Cube, so they
+    follow the piece as the Cube is turned. They are looked up once per state of the Cube.
+    pos is a new Point and colors a new list each time, so changing either does not move
+    the piece or change what later reads return.
+    """
+
+    def __init__(self, cube, sticker):
+        """
+        :param cube: The Cube this piece belongs to
+        :param sticker: The id of one of the stickers on this piece
+        """
+        self._cube = cube
+        self._sticker = sticker
+        # the state of the cube that _pos and _colors were looked up in
+        self._looked_up = None
+        # the position, as one of the Points of _SLOTS
+        self._pos = None
+        self._colors = None
+        self._set_piece_type()
+
+    def _look_up(self):
+        c = self._cube
+        state = c._state
+        if self._looked_up is not state:
+            pos, facelets = _SLOTS[_FACELET_SLOT[c._facelet_of()[self._sticker]]]
+            self._pos = pos
+            self._colors = tuple(None if f is None else c._stickers[state[f]] for f in facelets)
+            self._looked_up = state
+
+    @property
+    def pos(self):
+        self._look_up()
+        # a copy, so that changing it does not change the positions in _SLOTS (such as RIGHT)
+        pos = self._pos
+        return Point(pos.x, pos.y, pos.z)
+
+    @property
+    def colors(self):
+        self._look_up()
+        # a copy, so that changing it does not change the colors cached for this state
+        return list(self._colors)
+
+    def rotate(self, matrix):
+        raise TypeError("The pieces of a Cube can only be moved by turning the Cube")
+
+
 class Cube:
     """Stores Pieces which are addressed through an x-y-z coordinate system:
         -x is the LEFT direction, +x is the RIGHT direction
         -y is the DOWN direction, +y is the UP direction
         -z is the BACK direction, +z is the FRONT direction
+
+    Internally, the cube is a tuple of 54 sticker ids (one per facelet, in the order of the
+    cube string), and each move is a precomputed permutation of that tuple.
     """
 
-    def _from_cube(self, c):
-        self.faces = [Piece(pos=Point(p.pos), colors=p.colors) for p in c.faces]
-        self.edges = [Piece(pos=Point(p.pos), colors=p.colors) for p in c.edges]
-        self.corners = [Piece(pos=Point(p.pos), colors=p.colors) for p in c.corners]
-        self.pieces = self.faces + self.edges + self.corners
+    # the class of the cube's pieces
+    _piece_type = _CubePiece
 
-    def _assert_data(self):
-        assert len(self.pieces) == 26
-        assert all(p.type == FACE for p in self.faces)
-        assert all(p.type == EDGE for p in self.edges)
-        assert all(p.type == CORNER for p in self.corners)
+    def _from_cube(self, c):
+        self._stickers = c._stickers
+        self._state = c._state
+        self._zobrist = c._zobrist
+        self._zobrist_keys = c._zobrist_keys
+        self._facelets = None if c._facelets is None else list(c._facelets)
+        self._move_stack = []
+        self._make_pieces()
+
+    def _make_pieces(self):
+        pieces = [self._piece_type(self, self._state[f]) for f in _SLOT_FACELET]
+        self.faces = pieces[0:6]
+        self.edges = pieces[6:18]
+        self.corners = pieces[18:26]
+        self.pieces = pieces
+
+        # the piece that holds each sticker id
+        self._sticker_pieces = [None] * 54
+        # the piece with each set of colors, keyed by every ordering of those colors.
+        # stickers never change pieces, so neither index needs updating when the cube turns.
+        self._color_pieces = {}
+        for slot, piece in enumerate(pieces):
+            stickers = [self._state[f] for f in _SLOTS[slot][1] if f is not None]
+            for sticker in stickers:
+                self._sticker_pieces[sticker] = piece
+            for colors in itertools.permutations(self._stickers[sticker] for sticker in stickers):
+                self._color_pieces.setdefault(colors, piece)
 
     def __init__(self, cube_str):
         """
@@ -144,131 +505,170 @@ class Cube:
             return
 
         cube_str = "".join(x for x in cube_str if x not in string.whitespace)
-        assert len(cube_str) == 54
-        self.faces = (
-            Piece(pos=RIGHT, colors=(cube_str[28], None, None)),
-            Piece(pos=LEFT,  colors=(cube_str[22], None, None)),
-            Piece(pos=UP,    colors=(None, cube_str[4],  None)),
-            Piece(pos=DOWN,  colors=(None, cube_str[49], None)),
-            Piece(pos=FRONT, colors=(None, None, cube_str[25])),
-            Piece(pos=BACK,  colors=(None, None, cube_str[31])))
-        self.edges = (
-            Piece(pos=RIGHT + UP,    colors=(cube_str[16], cube_str[5], None)),
-            Piece(pos=RIGHT + DOWN,  colors=(cube_str[40], cube_str[50], None)),
-            Piece(pos=RIGHT + FRONT, colors=(cube_str[27], None, cube_str[26])),
-            Piece(pos=RIGHT + BACK,  colors=(cube_str[29], None, cube_str[30])),
-            Piece(pos=LEFT + UP,     colors=(cube_str[10], cube_str[3], None)),
-            Piece(pos=LEFT + DOWN,   colors=(cube_str[34], cube_str[48], None)),
-            Piece(pos=LEFT + FRONT,  colors=(cube_str[23], None, cube_str[24])),
-            Piece(pos=LEFT + BACK,   colors=(cube_str[21], None, cube_str[32])),
-            Piece(pos=UP + FRONT,    colors=(None, cube_str[7], cube_str[13])),
-            Piece(pos=UP + BACK,     colors=(None, cube_str[1], cube_str[19])),
-            Piece(pos=DOWN + FRONT,  colors=(None, cube_str[46], cube_str[37])),
-            Piece(pos=DOWN + BACK,   colors=(None, cube_str[52], cube_str[43])),
-        )
-        self.corners = (
-            Piece(pos=RIGHT + UP + FRONT,   colors=(cube_str[15], cube_str[8], cube_str[14])),
-            Piece(pos=RIGHT + UP + BACK,    colors=(cube_str[17], cube_str[2], cube_str[18])),
-            Piece(pos=RIGHT + DOWN + FRONT, colors=(cube_str[39], cube_str[47], cube_str[38])),
-            Piece(pos=RIGHT + DOWN + BACK,  colors=(cube_str[41], cube_str[53], cube_str[42])),
-            Piece(pos=LEFT + UP + FRONT,    colors=(cube_str[11], cube_str[6], cube_str[12])),
-            Piece(pos=LEFT + UP + BACK,     colors=(cube_str[9], cube_str[0], cube_str[20])),
-            Piece(pos=LEFT + DOWN + FRONT,  colors=(cube_str[35], cube_str[45], cube_str[36])),
-            Piece(pos=LEFT + DOWN + BACK,   colors=(cube_str[33], cube_str[51], cube_str[44])),
-        )
+        if len(cube_str) != 54:
+            raise ValueError(f"A cube string must have 54 stickers, got {len(cube_str)}")
+        # the color of each sticker, indexed by sticker id
+        self._stickers = tuple(cube_str)
+        # the id of the sticker on each facelet
+        self._state = tuple(range(54))
+        # the Zobrist hash of the state, maintained by each move once state_key() is first called
+        self._zobrist = None
+        self._zobrist_keys = None
+        # the facelet of each sticker id, maintained by each move once _facelet_of() is first called
+        self._facelets = None
+        # the moves applied with push_move() that have not been popped
+        self._move_stack = []
+        self._make_pieces()
 
-        self.pieces = self.faces + self.edges + self.corners
+    def is_solved(self):
+        colors = self._color_list()
+        return all(len({colors[i] for i in face}) == 1 for face in _FACE_FACELETS)
 
-        self._assert_data()
+    def _apply(self, name, moves=_MOVES):
+        """Apply the move with the given name, or undo it if moves is _UNDO_MOVES"""
+        self._permute(moves[name], _MOVE_FACELETS[name])
 
-    def is_solved(self):
-        def check(colors):
-            assert len(colors) == 9
-            return all(c == colors[0] for c in colors)
-        return (check([piece.colors[2] for piece in self._face(FRONT)]) and
-                check([piece.colors[2] for piece in self._face(BACK)]) and
-                check([piece.colors[1] for piece in self._face(UP)]) and
-                check([piece.colors[1] for piece in self._face(DOWN)]) and
-                check([piece.colors[0] for piece in self._face(LEFT)]) and
-                check([piece.colors[0] for piece in self._face(RIGHT)]))
-
-    def _face(self, axis):
+    def _permute(self, getter, facelets):
+        """
+        :param getter: A callable mapping the state tuple to the new state tuple
+        :param facelets: The facelets whose sticker the getter changes
+        """
+        old = self._state
+        new = self._state = getter(old)
+        if self._zobrist is not None:
+            h, keys = self._zobrist, self._zobrist_keys
+            for f in facelets:
+                h ^= keys[f][old[f]] ^ keys[f][new[f]]
+            self._zobrist = h
+        if self._facelets is not None:
+            where = self._facelets
+            for f in facelets:
+                where[new[f]] = f
+
+    def _facelet_of(self):
+        """:return: A list of the facelet that each sticker id is on"""
+        if self._facelets is None:
+            self._facelets = [None] * 54
+            for f, sticker in enumerate(self._state):
+                self._facelets[sticker] = f
+        return self._facelets
+
+    # Rubik's Cube Notation: http://ruwix.com/the-rubiks-cube/notation/
+    def L(self):  self._apply("L")
+    def Li(self): self._apply("Li")
+    def R(self):  self._apply("R")
+    def Ri(self): self._apply("Ri")
+    def U(self):  self._apply("U")
+    def Ui(self): self._apply("Ui")
+    def D(self):  self._apply("D")
+    def Di(self): self._apply("Di")
+    def F(self):  self._apply("F")
+    def Fi(self): self._apply("Fi")
+    def B(self):  self._apply("B")
+    def Bi(self): self._apply("Bi")
+    def M(self):  self._apply("M")
+    def Mi(self): self._apply("Mi")
+    def E(self):  self._apply("E")
+    def Ei(self): self._apply("Ei")
+    def S(self):  self._apply("S")
+    def Si(self): self._apply("Si")
+    def X(self):  self._apply("X")
+    def Xi(self): self._apply("Xi")
+    def Y(self):  self._apply("Y")
+    def Yi(self): self._apply("Yi")
+    def Z(self):  self._apply("Z")
+    def Zi(self): self._apply("Zi")
+    def L2(self): self._apply("L2")
+    def R2(self): self._apply("R2")
+    def U2(self): self._apply("U2")
+    def D2(self): self._apply("D2")
+    def F2(self): self._apply("F2")
+    def B2(self): self._apply("B2")
+    def M2(self): self._apply("M2")
+    def E2(self): self._apply("E2")
+    def S2(self): self._apply("S2")
+    def X2(self): self._apply("X2")
+    def Y2(self): self._apply("Y2")
+    def Z2(self): self._apply("Z2")
+
+    def snapshot(self):
         """
-        :param axis: One of LEFT, RIGHT, UP, DOWN, FRONT, BACK
-        :return: A list of Pieces on the given face
+        :return: An opaque token for the current state, to be passed to restore(). Taking a
+            snapshot does not copy the state.
         """
-        assert axis.count(0) == 2
-        return [p for p in self.pieces if p.pos.dot(axis) > 0]
+        return self._state, self._zobrist
 
-    def _slice(self, plane):
+    def restore(self, snapshot):
+        """Return to a state previously saved with snapshot() on this cube or a copy of it.
+        The move stack of push_move() is left as it is.
+        """
+        self._state, zobrist = snapshot
+        if self._zobrist is not None:
+            self._zobrist = zobrist if zobrist is not None else self._full_zobrist()
+        if self._facelets is not None:
+            # looked up again when next needed
+            self._facelets = None
+
+    def _full_zobrist(self):
+        keys = self._zobrist_keys
+        h = 0
+        for f, sticker in enumerate(self._state):
+            h ^= keys[f][sticker]
+        return h
+
+    def state_key(self):
         """
-        :param plane: A sum of any two of X_AXIS, Y_AXIS, Z_AXIS (e.g. X_AXIS + Y_AXIS)
-        :return: A list of Pieces in the given plane
+        :return: A 64 bit Zobrist hash of the colors of the cube. Equal cubes have equal keys,
+            and keys are the same across processes. After the first call, every move updates
+            the key in time proportional to the number of stickers it moves.
         """
-        assert plane.count(0) == 1
-        i = next((i for i, x in enumerate(plane) if x == 0))
-        return [p for p in self.pieces if p.pos[i] == 0]
+        if self._zobrist is None:
+            self._zobrist_keys = _zobrist_keys(self._stickers)
+            self._zobrist = self._full_zobrist()
+        return self._zobrist
 
-    def _rotate_face(self, face, matrix):
-        self._rotate_pieces(self._face(face), matrix)
+    def push_move(self, name):
+        """Apply the move with the given name (e.g. "Ri" or "R'") so that it can be undone with pop_move()
 
-    def _rotate_slice(self, plane, matrix):
-        self._rotate_pieces(self._slice(plane), matrix)
+        :raises ValueError: If the move name is unknown
+        """
+        if name not in _MOVE_NAME:
+            raise ValueError(f"Unknown moves: {name}")
+        name = _MOVE_NAME[name]
+        self._apply(name)
+        self._move_stack.append(name)
 
-    def _rotate_pieces(self, pieces, matrix):
-        for piece in pieces:
-            piece.rotate(matrix)
+    def pop_move(self):
+        """Undo the last move applied with push_move()
 
-    # Rubik's Cube Notation: http://ruwix.com/the-rubiks-cube/notation/
-    def L(self):  self._rotate_face(LEFT, ROT_YZ_CC)
-    def Li(self): self._rotate_face(LEFT, ROT_YZ_CW)
-    def R(self):  self._rotate_face(RIGHT, ROT_YZ_CW)
-    def Ri(self): self._rotate_face(RIGHT, ROT_YZ_CC)
-    def U(self):  self._rotate_face(UP, ROT_XZ_CW)
-    def Ui(self): self._rotate_face(UP, ROT_XZ_CC)
-    def D(self):  self._rotate_face(DOWN, ROT_XZ_CC)
-    def Di(self): self._rotate_face(DOWN, ROT_XZ_CW)
-    def F(self):  self._rotate_face(FRONT, ROT_XY_CW)
-    def Fi(self): self._rotate_face(FRONT, ROT_XY_CC)
-    def B(self):  self._rotate_face(BACK, ROT_XY_CC)
-    def Bi(self): self._rotate_face(BACK, ROT_XY_CW)
-    def M(self):  self._rotate_slice(Y_AXIS + Z_AXIS, ROT_YZ_CC)
-    def Mi(self): self._rotate_slice(Y_AXIS + Z_AXIS, ROT_YZ_CW)
-    def E(self):  self._rotate_slice(X_AXIS + Z_AXIS, ROT_XZ_CC)
-    def Ei(self): self._rotate_slice(X_AXIS + Z_AXIS, ROT_XZ_CW)
-    def S(self):  self._rotate_slice(X_AXIS + Y_AXIS, ROT_XY_CW)
-    def Si(self): self._rotate_slice(X_AXIS + Y_AXIS, ROT_XY_CC)
-    def X(self):  self._rotate_pieces(self.pieces, ROT_YZ_CW)
-    def Xi(self): self._rotate_pieces(self.pieces, ROT_YZ_CC)
-    def Y(self):  self._rotate_pieces(self.pieces, ROT_XZ_CW)
-    def Yi(self): self._rotate_pieces(self.pieces, ROT_XZ_CC)
-    def Z(self):  self._rotate_pieces(self.pieces, ROT_XY_CW)
-    def Zi(self): self._rotate_pieces(self.pieces, ROT_XY_CC)
+        :return: The name of the move that was undone
+        """
+        name = self._move_stack.pop()
+        self._apply(name, _UNDO_MOVES)
+        return name
 
     def sequence(self, move_str):
         """
-        :param moves: A string containing notated moves separated by spaces: "L Ri U M Ui B M"
+        :param move_str: A string containing notated moves separated by spaces: "L Ri U M Ui B M"
+            or "L R' U2 M", or an Algorithm. The moves are applied in a single step.
+        :raises ValueError: If a move name is unknown
         """
-        moves = [getattr(self, name) for name in move_str.split()]
-        for move in moves:
-            move()
+        algorithm = to_algorithm(move_str)
+        self._permute(algorithm._getter, algorithm._facelets)
 
     def find_piece(self, *colors):
-        if None in colors:
-            return
-        for p in self.pieces:
-            if p.colors.count(None) == 3 - len(colors) \
-                and all(c in p.colors for c in colors):
-                return p
+        """
+        :return: the Piece with exactly the given colors (in any order), or None
+        """
+        return self._color_pieces.get(colors)
 
     def get_piece(self, x, y, z):
         """
         :return: the Piece at the given Point
         """
-        point = Point(x, y, z)
-        for p in self.pieces:
-            if p.pos == point:
-                return p
+        slot = _SLOT_AT.get((x, y, z))
+        if slot is not None:
+            return self._sticker_pieces[self._state[_SLOT_FACELET[slot]]]
 
     def __getitem__(self, *args):
         if len(args) == 1:
@@ -281,46 +681,65 @@ class Cube:
     def __ne__(self, other):
         return not (self == other)
 
+    def __hash__(self):
+        # Cubes are mutable: a cube must not be turned while it is a key of a dict or set
+        return self.state_key()
+
     def colors(self):
         """
         :return: A set containing the colors of all stickers on the cube
         """
-        return set(c for piece in self.pieces for c in piece.colors if c is not None)
+        return set(self._stickers)
 
-    def left_color(self): return self[LEFT].colors[0]
-    def right_color(self): return self[RIGHT].colors[0]
-    def up_color(self): return self[UP].colors[1]
-    def down_color(self): return self[DOWN].colors[1]
-    def front_color(self): return self[FRONT].colors[2]
-    def back_color(self): return self[BACK].colors[2]
+    def _color_at(self, facelet):
+        return self._stickers[self._state[facelet]]
 
-    def _color_list(self):
-        right = [p.colors[0] for p in sorted(self._face(RIGHT), key=lambda p: (-p.pos.y, -p.pos.z))]
-        left  = [p.colors[0] for p in sorted(self._face(LEFT),  key=lambda p: (-p.pos.y, p.pos.z))]
-        up    = [p.colors[1] for p in sorted(self._face(UP),    key=lambda p: (p.pos.z, p.pos.x))]
-        down  = [p.colors[1] for p in sorted(self._face(DOWN),  key=lambda p: (-p.pos.z, p.pos.x))]
-        front = [p.colors[2] for p in sorted(self._face(FRONT), key=lambda p: (-p.pos.y, p.pos.x))]
-        back  = [p.colors[2] for p in sorted(self._face(BACK),  key=lambda p: (-p.pos.y, -p.pos.x))]
+    def left_color(self): return self._color_at(22)
+    def right_color(self): return self._color_at(28)
+    def up_color(self): return self._color_at(4)
+    def down_color(self): return self._color_at(49)
+    def front_color(self): return self._color_at(25)
+    def back_color(self): return self._color_at(31)
 
-        return (up + left[0:3] + front[0:3] + right[0:3] + back[0:3]
-                   + left[3:6] + front[3:6] + right[3:6] + back[3:6]
-                   + left[6:9] + front[6:9] + right[6:9] + back[6:9] + down)
+    def _color_list(self):
+        return list(map(self._stickers.__getitem__, self._state))
 
     def flat_str(self):
-        return "".join(x for x in str(self) if x not in string.whitespace)
+        return "".join(self._color_list())
+
+    def to_bytes(self):
+        """
+        :return: The compact binary encoding of this cube (see rubik.encoding)
+        """
+        return encoding.encode(self.flat_str())
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        :param data: A cube encoding as given by Cube.to_bytes()
+        """
+        return cls(encoding.decode(data))
 
     def __str__(self):
-        template = ("    {}{}{}\n"
-                    "    {}{}{}\n"
-                    "    {}{}{}\n"
-                    "{}{}{} {}{}{} {}{}{} {}{}{}\n"
-                    "{}{}{} {}{}{} {}{}{} {}{}{}\n"
-                    "{}{}{} {}{}{} {}{}{} {}{}{}\n"
-                    "    {}{}{}\n"
-                    "    {}{}{}\n"
-                    "    {}{}{}")
-
-        return "    " + template.format(*self._color_list()).strip()
+        return _format_net(self._color_list())
+
+
+def _format_net(colors):
+    """
+    :param colors: The 54 colors of a cube, in the order of the flat cube string
+    :return: The colors laid out as an unfolded cube (see Cube.__init__)
+    """
+    template = ("    {}{}{}\n"
+                "    {}{}{}\n"
+                "    {}{}{}\n"
+                "{}{}{} {}{}{} {}{}{} {}{}{}\n"
+                "{}{}{} {}{}{} {}{}{} {}{}{}\n"
+                "{}{}{} {}{}{} {}{}{} {}{}{}\n"
+                "    {}{}{}\n"
+                "    {}{}{}\n"
+                "    {}{}{}")
+
+    return "    " + template.format(*colors).strip()
 
 
 if __name__ == '__main__':
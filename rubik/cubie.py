@@ -0,0 +1,180 @@
+"""Convert between facelet colors and the cubie level description of a cube.
+
+At the cubie level a cube is described relative to its centers by four tuples:
+
+    cp: the corner at each corner position, in the order URF, UFL, ULB, UBR, DFR, DLF, DBL, DRB
+    co: the twist (0, 1 or 2) of the corner at each corner position
+    ep: the edge at each edge position, in the order UR, UF, UL, UB, DR, DF, DL, DB, FR, FL, BL, BR
+    eo: the flip (0 or 1) of the edge at each edge position
+
+A corner's twist is the index of its facelet that holds the U or D color, and an edge's
+flip is 0 when its facelets hold the colors of its home position in order. Facelets are
+numbered as in the cube string (see rubik.cube.Cube.__init__).
+"""
+
+# The center facelet of each face, in the order U, L, F, R, B, D
+CENTER_FACELETS = (4, 22, 25, 28, 31, 49)
+U, L, F, R, B, D = range(6)
+
+# The facelets of each corner position, starting with the U or D facelet and going
+# clockwise around the corner
+CORNER_FACELETS = (
+    (8, 15, 14),   # URF
+    (6, 12, 11),   # UFL
+    (0, 9, 20),    # ULB
+    (2, 18, 17),   # UBR
+    (47, 38, 39),  # DFR
+    (45, 35, 36),  # DLF
+    (51, 44, 33),  # DBL
+    (53, 41, 42),  # DRB
+)
+
+# The facelets of each edge position, starting with the U or D facelet (or the F or B
+# facelet for the middle layer)
+EDGE_FACELETS = (
+    (5, 16),   # UR
+    (7, 13),   # UF
+    (3, 10),   # UL
+    (1, 19),   # UB
+    (50, 40),  # DR
+    (46, 37),  # DF
+    (48, 34),  # DL
+    (52, 43),  # DB
+    (26, 27),  # FR
+    (24, 23),  # FL
+    (32, 21),  # BL
+    (30, 29),  # BR
+)
+
+
+def _facelet_face(f):
+    if f < 9: return U
+    if f >= 45: return D
+    return (L, F, R, B)[(f - 9) % 12 // 3]
+
+
+# The face of each facelet
+FACELET_FACES = tuple(_facelet_face(f) for f in range(54))
+
+# The faces of each corner and edge, in the order of their facelets
+CORNER_FACES = tuple(tuple(_facelet_face(f) for f in facelets) for facelets in CORNER_FACELETS)
+EDGE_FACES = tuple(tuple(_facelet_face(f) for f in facelets) for facelets in EDGE_FACELETS)
+
+_CORNER_INDEX = {faces: i for i, faces in enumerate(CORNER_FACES)}
+_EDGE_INDEX = {faces: i for i, faces in enumerate(EDGE_FACES)}
+
+SOLVED = (tuple(range(8)), (0,) * 8, tuple(range(12)), (0,) * 12)
+
+
+def from_facelets(colors):
+    """
+    :param colors: The 54 colors of a cube, e.g. a flat cube string
+    :return: A pair (centers, cubies) where centers is a tuple of the center colors in the
+        order U, L, F, R, B, D and cubies is a tuple (cp, co, ep, eo)
+    :raises ValueError: If the colors do not describe a cube with six distinct centers and
+        one of each corner and edge
+    """
+    centers = tuple(colors[f] for f in CENTER_FACELETS)
+    face_of = {color: face for face, color in enumerate(centers)}
+    if len(face_of) != 6:
+        raise ValueError(f"The centers must have six different colors, got {centers}")
+
+    cp, co = [], []
+    for facelets in CORNER_FACELETS:
+        faces = [face_of.get(colors[f]) for f in facelets]
+        for ori in range(3):
+            if faces[ori] == U or faces[ori] == D:
+                break
+        else:
+            raise ValueError(f"No U or D color on the corner at facelets {facelets}")
+        corner = _CORNER_INDEX.get((faces[ori], faces[(ori + 1) % 3], faces[(ori + 2) % 3]))
+        if corner is None:
+            raise ValueError(f"Invalid corner at facelets {facelets}")
+        cp.append(corner)
+        co.append(ori)
+
+    ep, eo = [], []
+    for facelets in EDGE_FACELETS:
+        a, b = (face_of.get(colors[f]) for f in facelets)
+        if (a, b) in _EDGE_INDEX:
+            ep.append(_EDGE_INDEX[a, b])
+            eo.append(0)
+        elif (b, a) in _EDGE_INDEX:
+            ep.append(_EDGE_INDEX[b, a])
+            eo.append(1)
+        else:
+            raise ValueError(f"Invalid edge at facelets {facelets}")
+
+    if len(set(cp)) != 8 or len(set(ep)) != 12:
+        raise ValueError("Each corner and edge must appear exactly once")
+    return centers, (tuple(cp), tuple(co), tuple(ep), tuple(eo))
+
+
+def to_facelets(centers, cubies):
+    """The inverse of from_facelets()
+
+    :return: A list of the 54 colors of the cube
+    """
+    cp, co, ep, eo = cubies
+    colors = [None] * 54
+    for face, f in enumerate(CENTER_FACELETS):
+        colors[f] = centers[face]
+    for facelets, corner, ori in zip(CORNER_FACELETS, cp, co):
+        for n, face in enumerate(CORNER_FACES[corner]):
+            colors[facelets[(n + ori) % 3]] = centers[face]
+    for facelets, edge, ori in zip(EDGE_FACELETS, ep, eo):
+        for n, face in enumerate(EDGE_FACES[edge]):
+            colors[facelets[(n + ori) % 2]] = centers[face]
+    return colors
+
+
+def multiply_corners(a, b):
+    """
+    :param a: A pair (cp, co)
+    :param b: A pair (cp, co)
+    :return: The pair (cp, co) of the cube a after the moves that take a solved cube to b
+    """
+    acp, aco = a
+    bcp, bco = b
+    return tuple(acp[j] for j in bcp), tuple((aco[j] + o) % 3 for j, o in zip(bcp, bco))
+
+
+def multiply_edges(a, b):
+    """
+    :param a: A pair (ep, eo)
+    :param b: A pair (ep, eo)
+    :return: The pair (ep, eo) of the cube a after the moves that take a solved cube to b
+    """
+    aep, aeo = a
+    bep, beo = b
+    return tuple(aep[j] for j in bep), tuple((aeo[j] + o) % 2 for j, o in zip(bep, beo))
+
+
+def multiply(a, b):
+    """
+    :param a: A tuple (cp, co, ep, eo)
+    :param b: A tuple (cp, co, ep, eo)
+    :return: The cubies of the cube a after the moves that take a solved cube to b
+    """
+    return multiply_corners(a[:2], b[:2]) + multiply_edges(a[2:], b[2:])
+
+
+def permutation_rank(perm):
+    """:return: The index of perm in the lexicographic order of permutations of range(len(perm))"""
+    rank = 0
+    remaining = sorted(perm)
+    for x in perm:
+        i = remaining.index(x)
+        rank = rank * len(remaining) + i
+        del remaining[i]
+    return rank
+
+
+def permutation_unrank(rank, n):
+    """The inverse of permutation_rank()"""
+    digits = []
+    for size in range(1, n + 1):
+        rank, i = divmod(rank, size)
+        digits.append(i)
+    remaining = list(range(n))
+    return tuple(remaining.pop(i) for i in reversed(digits))
@@ -0,0 +1,93 @@
+"""A compact binary encoding of cube states.
+
+A state is encoded in RECORD_SIZE (15) bytes: the six ASCII center colors in the order
+U, L, F, R, B, D, followed by a 9 byte big-endian rank of the cubies (see rubik.cubie).
+"""
+from math import factorial
+
+from rubik import cubie
+
+RECORD_SIZE = 15
+_RANK_SIZE = RECORD_SIZE - 6
+
+_CP_COUNT = factorial(8)
+_CO_COUNT = 3 ** 8
+_EP_COUNT = factorial(12)
+
+
+def _digits_rank(digits, base):
+    rank = 0
+    for x in digits:
+        rank = rank * base + x
+    return rank
+
+
+def _digits_unrank(rank, base, n):
+    digits = []
+    for _ in range(n):
+        rank, x = divmod(rank, base)
+        digits.append(x)
+    return tuple(reversed(digits))
+
+
+def cubies_rank(cubies):
+    """
+    :param cubies: A tuple (cp, co, ep, eo) as given by rubik.cubie.from_facelets()
+    :return: An integer rank, in 0 <= rank < 2**69
+    """
+    cp, co, ep, eo = cubies
+    rank = _digits_rank(eo, 2)
+    rank = rank * _EP_COUNT + cubie.permutation_rank(ep)
+    rank = rank * _CO_COUNT + _digits_rank(co, 3)
+    return rank * _CP_COUNT + cubie.permutation_rank(cp)
+
+
+def cubies_unrank(rank):
+    """The inverse of cubies_rank()"""
+    rank, cp = divmod(rank, _CP_COUNT)
+    rank, co = divmod(rank, _CO_COUNT)
+    eo, ep = divmod(rank, _EP_COUNT)
+    return (cubie.permutation_unrank(cp, 8), _digits_unrank(co, 3, 8),
+            cubie.permutation_unrank(ep, 12), _digits_unrank(eo, 2, 12))
+
+
+def encode(cube_str):
+    """
+    :param cube_str: A flat cube string (see rubik.cube.Cube.flat_str)
+    :return: The RECORD_SIZE byte encoding of the cube
+    :raises ValueError: If cube_str does not describe a cube with six distinct ASCII center
+        colors and one of each corner and edge
+    """
+    centers, cubies = cubie.from_facelets(cube_str)
+    return "".join(centers).encode("ascii") + cubies_rank(cubies).to_bytes(_RANK_SIZE, "big")
+
+
+def decode(data):
+    """
+    :param data: The RECORD_SIZE byte encoding of a cube
+    :return: The flat cube string of the cube
+    """
+    if len(data) != RECORD_SIZE:
+        raise ValueError(f"Expected {RECORD_SIZE} bytes, got {len(data)}")
+    centers = bytes(data[:6]).decode("ascii")
+    cubies = cubies_unrank(int.from_bytes(data[6:], "big"))
+    return "".join(cubie.to_facelets(centers, cubies))
+
+
+def encode_many(cube_strs):
+    """
+    :param cube_strs: An iterable of flat cube strings
+    :return: The encodings of the cubes, concatenated
+    """
+    return b"".join(encode(s) for s in cube_strs)
+
+
+def decode_many(data):
+    """
+    :param data: Concatenated cube encodings, as given by encode_many()
+    :return: A list of flat cube strings
+    """
+    if len(data) % RECORD_SIZE:
+        raise ValueError(f"Expected a multiple of {RECORD_SIZE} bytes, got {len(data)}")
+    view = memoryview(data)
+    return [decode(view[i:i + RECORD_SIZE]) for i in range(0, len(data), RECORD_SIZE)]
@@ -0,0 +1,118 @@
+"""Measurements of the stages of the layer-by-layer Solver.
+
+Pass a callback as Solver(c, on_stage=...) to receive a StageStats after each stage. A
+StageReport is such a callback that adds up the stats of many solves:
+
+    report = StageReport()
+    for c in cubes:
+        Solver(c, on_stage=report).solve()
+    print(report)
+
+Solvers without a callback measure nothing.
+"""
+from collections import namedtuple
+
+from rubik import cube
+
+
+class StageStats(namedtuple("StageStats", ["stage", "seconds", "moves", "permutations", "lookups"])):
+    """The work one stage of a solve did
+
+    stage: The name of the Solver method, e.g. "cross"
+    seconds: The wall time the stage took
+    moves: The number of moves the stage added to Solver.moves
+    permutations: The number of times the stage turned the solver's cube, counting a move
+        sequence as one
+    lookups: The number of reads of the solver's cube: one for each piece found by color or
+        position, each read of a piece's position or colors and each center color read, and
+        one for each sticker read with flat_str()
+    """
+    __slots__ = ()
+
+
+class _CountingPiece(cube._CubePiece):
+    """A piece of a CountingCube, which counts the reads of its position and colors"""
+
+    @property
+    def pos(self):
+        self._cube.lookups += 1
+        return super().pos
+
+    @property
+    def colors(self):
+        self._cube.lookups += 1
+        return super().colors
+
+
+class CountingCube(cube.Cube):
+    """A Cube that counts the work done on it"""
+
+    _piece_type = _CountingPiece
+
+    def __init__(self, cube_str):
+        self.permutations = 0
+        self.lookups = 0
+        super().__init__(cube_str)
+        # building the pieces reads them, which isn't work done on the cube
+        self.lookups = 0
+
+    def _permute(self, getter, facelets):
+        self.permutations += 1
+        super()._permute(getter, facelets)
+
+    def find_piece(self, *colors):
+        self.lookups += 1
+        return super().find_piece(*colors)
+
+    def get_piece(self, x, y, z):
+        self.lookups += 1
+        return super().get_piece(x, y, z)
+
+    def _color_at(self, facelet):
+        self.lookups += 1
+        return super()._color_at(facelet)
+
+    def flat_str(self):
+        self.lookups += 54
+        return super().flat_str()
+
+
+class StageReport:
+    """Adds up the StageStats of many solves, by stage"""
+
+    def __init__(self):
+        # the total StageStats of each stage, in the order the stages were first seen, and
+        # the number of solves added to each
+        self.totals = {}
+        self.counts = {}
+
+    def __call__(self, stats):
+        self.add(stats)
+
+    def add(self, stats):
+        """Add the StageStats of one stage of one solve"""
+        self._add(stats, 1)
+
+    def merge(self, other):
+        """Add the totals of another StageReport, e.g. from another process"""
+        for stage, total in other.totals.items():
+            self._add(total, other.counts[stage])
+
+    def _add(self, stats, count):
+        total = self.totals.get(stats.stage)
+        if total is not None:
+            stats = StageStats(stats.stage, *(a + b for a, b in zip(total[1:], stats[1:])))
+        self.totals[stats.stage] = stats
+        self.counts[stats.stage] = self.counts.get(stats.stage, 0) + count
+
+    def averages(self):
+        """:return: A StageStats for each stage with the average of its stats"""
+        return [StageStats(stage, *(x / self.counts[stage] for x in total[1:]))
+                for stage, total in self.totals.items()]
+
+    def __str__(self):
+        lines = [f"{'stage':<16}{'count':>8}{'ms':>10}{'moves':>10}{'perms':>10}{'lookups':>10}"]
+        for stats in self.averages():
+            lines.append(f"{stats.stage:<16}{self.counts[stats.stage]:>8}{stats.seconds * 1000:>10.3f}"
+                         f"{stats.moves:>10.1f}{stats.permutations:>10.1f}{stats.lookups:>10.1f}")
+        return "\n".join(lines)
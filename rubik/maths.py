@@ -4,6 +4,11 @@ class Point:
 
     def __init__(self, x, y=None, z=None):
         """Construct a Point from an (x, y, z) tuple or an iterable"""
+        if x is not None and y is not None and z is not None and not hasattr(x, "__iter__"):
+            self.x = x
+            self.y = y
+            self.z = z
+            return
         try:
             # convert from an iterable
             ii = iter(x)
@@ -15,7 +20,7 @@ class Point:
             self.x = x
             self.y = y
             self.z = z
-        if any(val is None for val in self):
+        if self.x is None or self.y is None or self.z is None:
             raise ValueError(f"Point does not allow None values: {self}")
 
     def __str__(self):
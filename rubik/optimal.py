@@ -0,0 +1,217 @@
+"""An optimal solver.
+
+The solver runs an iterative deepening A* (IDA*) search over coordinates (see rubik.coord),
+so it finds a solution with the fewest face turns (counting half turns as one). The
+heuristic is the largest lower bound given by a set of pattern databases:
+
+    the permutation of the corners
+    the positions and twists of the four U corners
+    the positions and flips of the four middle layer edges
+    the twist of the corners with the positions of the middle layer edges
+    the flip of the edges with the positions of the middle layer edges
+
+The last four are also looked up for the cube seen along its L-R and F-B axes, so between
+them they cover every corner and edge. The databases are built once and loaded from disk
+(see rubik.tables).
+
+Solutions of up to about 12 moves are found in seconds. The search for longer ones grows
+quickly, so use a timeout for cubes that may be far from solved.
+"""
+import time
+
+import rubik.tables
+from rubik import coord, twophase, validate
+
+_N = len(coord.MOVES)
+
+# The face (0 to 5 for U, R, F, D, L, B) of each move in MOVES
+_FACE = tuple(m // 3 for m in range(_N))
+
+_SLICE_SIZE = coord.SLICE.size
+
+_single_move_tables = (
+    ("corners", coord.CORNERS),
+    ("u_corner_subset", coord.U_CORNER_SUBSET),
+    ("slice_edge_subset", coord.SLICE_EDGE_SUBSET),
+)
+
+
+def _register_tables():
+    no_moves = (0,) * _N
+    for name, coordinate in _single_move_tables:
+        rubik.tables.register(f"optimal.{name}_move", coordinate.move_table)
+
+        def build(name=name, size=coordinate.size):
+            return twophase.pruning_table(rubik.tables.load(f"optimal.{name}_move"), size, no_moves, 1, _N)
+        rubik.tables.register(f"optimal.{name}_prune", build)
+
+
+_register_tables()
+
+
+class _Search:
+
+    def __init__(self, cubies_by_frame, max_length, deadline):
+        load = rubik.tables.load
+        self.corners_move = load("optimal.corners_move")
+        self.corners_prune = load("optimal.corners_prune")
+        self.u_corners_move = load("optimal.u_corner_subset_move")
+        self.u_corners_prune = load("optimal.u_corner_subset_prune")
+        self.slice_edges_move = load("optimal.slice_edge_subset_move")
+        self.slice_edges_prune = load("optimal.slice_edge_subset_prune")
+        self.twist_move = load("twophase.twist_move")
+        self.flip_move = load("twophase.flip_move")
+        self.slice_move = load("twophase.slice_move")
+        self.twist_slice_prune = load("twophase.twist_slice_prune")
+        self.flip_slice_prune = load("twophase.flip_slice_prune")
+
+        # The state is the corner permutation, followed by the twist, flip, slice, U corners
+        # and middle layer edges coordinates of the cube seen in each frame
+        state = [coord.CORNERS.get(cubies_by_frame[0])]
+        for cubies in cubies_by_frame:
+            state.extend(c.get(cubies) for c in (
+                coord.TWIST, coord.FLIP, coord.SLICE, coord.U_CORNER_SUBSET, coord.SLICE_EDGE_SUBSET))
+        self.state = tuple(state)
+
+        self.max_length = max_length
+        self.deadline = deadline
+        self.moves = []
+        self.solution = None
+        # True if the search stopped at the deadline, rather than after trying every length
+        self.timed_out = False
+        self.nodes = 0
+        self.seconds = 0.0
+
+    def run(self):
+        """:return: A list of indices into MOVES, or None if no solution was found"""
+        start = time.monotonic()
+        for length in range(self._heuristic(self.state), self.max_length + 1):
+            if self._search(self.state, length, -1):
+                break
+        self.seconds = time.monotonic() - start
+        return self.solution
+
+    def _timed_out(self):
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            self.timed_out = True
+        return self.timed_out
+
+    def _heuristic(self, state):
+        h = self.corners_prune[state[0]]
+        for i in range(1, len(state), 5):
+            twist, flip, slice_, u_corners, slice_edges = state[i:i + 5]
+            h = max(h, self.twist_slice_prune[twist * _SLICE_SIZE + slice_],
+                    self.flip_slice_prune[flip * _SLICE_SIZE + slice_],
+                    self.u_corners_prune[u_corners], self.slice_edges_prune[slice_edges])
+        return h
+
+    def _move(self, state, m, togo):
+        """:return: The state after the move m, or None if it can not be solved in fewer than togo moves"""
+        corners = self.corners_move[state[0] * _N + m]
+        if self.corners_prune[corners] >= togo:
+            return None
+        child = [corners]
+        i = 1
+        for frame_moves in coord.AXIS_MOVES:
+            k = frame_moves[m]
+            slice_ = self.slice_move[state[i + 2] * _N + k]
+            twist = self.twist_move[state[i] * _N + k]
+            if self.twist_slice_prune[twist * _SLICE_SIZE + slice_] >= togo:
+                return None
+            flip = self.flip_move[state[i + 1] * _N + k]
+            if self.flip_slice_prune[flip * _SLICE_SIZE + slice_] >= togo:
+                return None
+            u_corners = self.u_corners_move[state[i + 3] * _N + k]
+            if self.u_corners_prune[u_corners] >= togo:
+                return None
+            slice_edges = self.slice_edges_move[state[i + 4] * _N + k]
+            if self.slice_edges_prune[slice_edges] >= togo:
+                return None
+            child += (twist, flip, slice_, u_corners, slice_edges)
+            i += 5
+        return tuple(child)
+
+    def _search(self, state, togo, last_face):
+        """:return: True to stop the search"""
+        self.nodes += 1
+        if togo == 0:
+            if any(state):
+                return False
+            self.solution = list(self.moves)
+            return True
+
+        for m in range(_N):
+            face = _FACE[m]
+            if face == last_face or face + 3 == last_face:
+                continue
+            child = self._move(state, m, togo)
+            if child is None:
+                continue
+            self.moves.append(m)
+            if self._search(child, togo - 1, face):
+                return True
+            self.moves.pop()
+        return self._timed_out()
+
+
+def _run(c, max_length, deadline):
+    validate.check(c)
+    cubies_by_frame = coord.axis_cubies(c)
+    search = _Search(cubies_by_frame, max_length, deadline)
+    search.run()
+    return search
+
+
+def solve(c, max_length=20, timeout=None):
+    """Find a shortest solution for the Cube c. The cube is not changed.
+
+    :param max_length: The maximum number of face turns (counting half turns as one) to search
+    :param timeout: If given, the number of seconds after which to give up
+    :return: A list of moves like Solver.moves, with half turns written as two quarter turns,
+        or None if no solution was found within max_length moves and the timeout
+    :raises ValueError: If the cube can not be solved
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    solution = _run(c, max_length, deadline).solution
+    if solution is None:
+        return None
+    return coord.move_names(solution)
+
+
+class OptimalSolver:
+    """Finds solutions with the fewest face turns, counting half turns as one"""
+
+    def __init__(self, c, max_length=20, timeout=None):
+        """
+        :param max_length: The maximum number of face turns to search
+        :param timeout: If given, the number of seconds after which to give up
+        """
+        self.cube = c
+        self.max_length = max_length
+        self.timeout = timeout
+        self.moves = []
+        self.nodes = 0
+        self.seconds = 0.0
+
+    @property
+    def nodes_per_second(self):
+        """:return: The number of nodes the last search expanded per second"""
+        return self.nodes / self.seconds if self.seconds else 0.0
+
+    def solve(self):
+        """Solve the cube and record the solution in self.moves, with half turns written
+        as two quarter turns. The number of nodes the search expanded and the time it took
+        are recorded in self.nodes and self.seconds.
+
+        :raises ValueError: If the cube can not be solved
+        :raises twophase.NoSolutionError: If no solution was found within max_length moves and the
+            timeout
+        """
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        search = _run(self.cube, self.max_length, deadline)
+        self.nodes = search.nodes
+        self.seconds = search.seconds
+        if search.solution is None:
+            raise twophase.NoSolutionError(f"No solution within {self.max_length} moves\n" + str(self.cube))
+        self.moves = coord.move_names(search.solution)
+        self.cube.sequence(" ".join(self.moves))
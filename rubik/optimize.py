@@ -1,3 +1,10 @@
+import collections
+import functools
+import hashlib
+import operator
+from array import array
+
+import rubik.tables
 from rubik import cube
 
 X_ROT_CW = {
@@ -52,30 +59,30 @@ def _invert(move):
 
 def apply_repeat_three_optimization(moves):
     """ R, R, R --> Ri """
-    changed = False
-    i = 0
-    while i < len(moves) - 2:
-        if moves[i] == moves[i+1] == moves[i+2]:
-            moves[i:i+3] = [_invert(moves[i])]
-            changed = True
-        else:
-            i += 1
-    if changed:
-        apply_repeat_three_optimization(moves)
+    changed = True
+    while changed:
+        changed = False
+        i = 0
+        while i < len(moves) - 2:
+            if moves[i] == moves[i+1] == moves[i+2]:
+                moves[i:i+3] = [_invert(moves[i])]
+                changed = True
+            else:
+                i += 1
 
 
 def apply_do_undo_optimization(moves):
     """ R Ri --> <nothing>, R R Ri Ri --> <nothing> """
-    changed = False
-    i = 0
-    while i < len(moves) - 1:
-        if _invert(moves[i]) == moves[i+1]:
-            moves[i:i+2] = []
-            changed = True
-        else:
-            i += 1
-    if changed:
-        apply_do_undo_optimization(moves)
+    changed = True
+    while changed:
+        changed = False
+        i = 0
+        while i < len(moves) - 1:
+            if _invert(moves[i]) == moves[i+1]:
+                moves[i:i+2] = []
+                changed = True
+            else:
+                i += 1
 
 
 def _unrotate(rot, moves):
@@ -93,31 +100,338 @@ def _unrotate(rot, moves):
 
 def apply_no_full_cube_rotation_optimization(moves):
     rots = {'X', 'Y', 'Z', 'Xi', 'Yi', 'Zi'}
-    changed = False
-    i = 0
-    while i < len(moves):
-        if moves[i] not in rots:
+    changed = True
+    while changed:
+        changed = False
+        i = 0
+        while i < len(moves):
+            if moves[i] not in rots:
+                i += 1
+                continue
+
+            for j in reversed(range(i + 1, len(moves))):
+                if moves[j] == _invert(moves[i]):
+                    moves[i:j+1] = _unrotate(moves[i], moves[i+1:j])
+                    changed = True
+                    break
             i += 1
-            continue
 
-        for j in reversed(range(i + 1, len(moves))):
-            if moves[j] == _invert(moves[i]):
-                moves[i:j+1] = _unrotate(moves[i], moves[i+1:j])
-                changed = True
-                break
-        i += 1
-    if changed:
-        apply_no_full_cube_rotation_optimization(moves)
 
+# The metrics optimize_moves() can count moves in: in the quarter turn metric a half turn
+# is two moves (R R), in the half turn metric it is one (R2)
+QUARTER_TURN_METRIC = 'qtm'
+HALF_TURN_METRIC = 'htm'
+
+# The quarter turn names, which relabeling frames map to each other
+_NAMES = tuple(name for base in 'LRUDFBMESXYZ' for name in (base, base + 'i'))
+_INDEX = {name: i for i, name in enumerate(_NAMES)}
+
+
+def _turns(name):
+    """:return: The face, slice or rotation of a move name in MOVE_NAMES, and its number of
+        clockwise quarter turns"""
+    return name[0], 3 if name.endswith('i') else 2 if name.endswith('2') else 1
+
+
+# The face, slice or rotation and number of clockwise quarter turns of every move name,
+# including those in standard notation (R', R2)
+_TURNS = {token: _turns(name) for token, name in cube._MOVE_NAME.items()}
+_ROTATIONS = {token for token, (base, _) in _TURNS.items() if base in 'XYZ'}
+
+
+@functools.lru_cache(maxsize=256)
+def _rotate_frame(frame, rot):
+    """
+    :param frame: A tuple of the move in the original orientation with the same effect as
+        each move in _NAMES, in the current orientation of the cube
+    :return: The frame after the whole cube rotation rot
+    """
+    original = dict(zip(_NAMES, frame))
+    return tuple(original[name] for name in _unrotate(rot, _NAMES))
+
+
+def _rotate_frame_by(frame, rot):
+    """:return: The frame after the whole cube rotation rot, in any notation"""
+    base, turns = _TURNS[rot]
+    for _ in range(turns):
+        frame = _rotate_frame(frame, base)
+    return frame
+
+
+def _rotation_words(rotations):
+    """:return: The shortest sequence of the whole cube rotations that gives each frame"""
+    identity = tuple(_NAMES)
+    words = {identity: []}
+    frontier = [identity]
+    while frontier:
+        next_frontier = []
+        for frame in frontier:
+            for rot in rotations:
+                rotated = _rotate_frame_by(frame, rot)
+                if rotated not in words:
+                    words[rotated] = words[frame] + [rot]
+                    next_frontier.append(rotated)
+        frontier = next_frontier
+    return words
+
+
+_ROTATION_WORDS = {
+    QUARTER_TURN_METRIC: _rotation_words(('X', 'Xi', 'Y', 'Yi', 'Z', 'Zi')),
+    HALF_TURN_METRIC: _rotation_words(('X', 'Xi', 'X2', 'Y', 'Yi', 'Y2', 'Z', 'Zi', 'Z2')),
+}
+
+
+# The axis of each face, slice and rotation. Moves on the same axis commute, e.g. R L Ri is L.
+_AXIS = {base: axis for axis, bases in enumerate(('LRMX', 'UDEY', 'FBSZ')) for base in bases}
+
+# The order of the moves on an axis, when several are next to each other in the result
+_ORDER = {base: i for i, base in enumerate('LRMXUDEYFBSZ')}
+
+
+def _push(stack, base, turns):
+    """Add turns quarter turns of base to the moves on the stack. Moves on the same axis at
+    the top of the stack are kept in _ORDER, and base merges with one of them."""
+    axis = _AXIS[base]
+    i = len(stack)
+    while i and _AXIS.get(stack[i - 1][0]) == axis and _ORDER[stack[i - 1][0]] >= _ORDER[base]:
+        i -= 1
+        if stack[i][0] == base:
+            turns = (stack[i][1] + turns) % 4
+            if turns:
+                stack[i][1] = turns
+            else:
+                del stack[i]
+            return
+    stack.insert(i, [base, turns])
+
+
+# The number of stack entries iter_optimize_moves() keeps by default
+STREAM_BUFFER = 256
+
+
+def _names(entries, metric):
+    """:return: The move names of stack entries, written in the metric"""
+    for base, turns in entries:
+        if turns == 3:
+            yield base + 'i'
+        elif turns == 2 and metric == HALF_TURN_METRIC:
+            yield base + '2'
+        else:
+            yield from [base] * turns
+
+
+def iter_optimize_moves(moves, metric=QUARTER_TURN_METRIC, buffer=STREAM_BUFFER):
+    """Shorten a stream of moves in one pass, without changing its effect on the cube.
 
-def optimize_moves(moves):
-    result = list(moves)
-    apply_no_full_cube_rotation_optimization(result)
-    apply_repeat_three_optimization(result)
-    apply_do_undo_optimization(result)
+    Whole cube rotations are taken out by relabeling the moves after them, and the fewest
+    rotations with the same effect are put back at the end (or before the next unknown
+    move). Each face and slice move is added to a stack of moves with their net number of
+    quarter turns. Moves on the same axis commute, so a move merges with a turn of the same
+    face anywhere in the run of moves on its axis at the top of the stack (R L Ri is L), and
+    when they cancel out, the move below can merge with the next one.
+
+    Moves are yielded as soon as they can no longer change: at an unknown move, at the end,
+    and from the bottom of the stack when it holds more than buffer moves. So the result is
+    the same as optimize_moves() unless a cancellation reaches further back than buffer
+    moves, e.g. a sequence of more than buffer moves followed by its inverse.
+
+    :param moves: An iterable of move names, in either notation (Ri or R', R R or R2). Names
+        that are not moves are kept in place.
+    :param metric: QUARTER_TURN_METRIC to write half turns as two quarter turns (R R), or
+        HALF_TURN_METRIC to write them as one move (R2)
+    :param buffer: The most moves to hold back, or None to hold back as many as needed
+    :return: A generator of names in MOVE_NAMES, with three quarter turns as one (Ri)
+    """
+    rotation_words = _ROTATION_WORDS[metric]
+    identity = tuple(_NAMES)
+    stack = collections.deque()
+    # the orientation of the cube after the rotations so far
+    frame = identity
+    for move in moves:
+        if move in _ROTATIONS:
+            frame = _rotate_frame_by(frame, move)
+        elif move in _TURNS:
+            base, turns = _TURNS[move]
+            base, relabeled = _TURNS[frame[_INDEX[base]]]
+            _push(stack, base, turns * relabeled % 4)
+            if buffer is not None and len(stack) > buffer:
+                yield from _names([stack.popleft()], metric)
+        else:
+            for rot in rotation_words[frame]:
+                _push(stack, *_TURNS[rot])
+            frame = identity
+            # nothing after move can merge with the moves before it
+            yield from _names(stack, metric)
+            stack.clear()
+            yield move
+    for rot in rotation_words[frame]:
+        _push(stack, *_TURNS[rot])
+    yield from _names(stack, metric)
+
+
+def optimize_moves(moves, metric=QUARTER_TURN_METRIC, peephole=False):
+    """Shorten a move sequence, like iter_optimize_moves() with no limit on the moves it
+    holds back
+
+    :param moves: A list of move names, in either notation (Ri or R', R R or R2). Names
+        that are not moves are kept in place.
+    :param metric: QUARTER_TURN_METRIC to write half turns as two quarter turns (R R), or
+        HALF_TURN_METRIC to write them as one move (R2)
+    :param peephole: Whether to also replace short runs of moves with shorter equivalents
+        from the peephole table (see apply_peephole_optimization), until none are left
+    :return: The shortened list of names in MOVE_NAMES, with three quarter turns as one (Ri)
+    """
+    result = list(iter_optimize_moves(moves, metric, buffer=None))
+    while peephole and apply_peephole_optimization(result, metric):
+        # the replacements may cancel with the moves around them
+        result = list(iter_optimize_moves(result, metric, buffer=None))
     return result
 
 
+# The face turns of the peephole table, and the most face turns of a sequence in it
+_PEEPHOLE_MOVES = tuple(face + turn for face in 'URFDLB' for turn in ('', '2', 'i'))
+PEEPHOLE_DEPTH = 4
+
+# The most face turns apply_peephole_optimization() replaces at once, counting a half turn
+# written as R R as one
+PEEPHOLE_WINDOW = 8
+
+# The number of slots of the peephole table, a power of two, about three per sequence
+_PEEPHOLE_SLOTS = 1 << 17
+_EMPTY_SLOT = 0xffffffff
+
+# Each move as a callable that maps a permutation to the permutation after the move
+_GETTERS = {name: operator.itemgetter(*perm) for name, perm in cube.MOVE_TABLES.items()}
+_IDENTITY = tuple(range(54))
+
+
+def _quarter_turns(names):
+    return sum(2 if name.endswith('2') else 1 for name in names)
+
+
+def _cost(names, metric):
+    """:return: The number of moves in names, in the metric"""
+    return _quarter_turns(names) if metric == QUARTER_TURN_METRIC else len(names)
+
+
+def _in_metric(names, metric):
+    """:return: The moves written in the metric, with half turns as R R in the quarter turn metric"""
+    if metric == HALF_TURN_METRIC:
+        return names
+    return [turn for name in names for turn in ((name[0], name[0]) if name.endswith('2') else (name,))]
+
+
+def _peephole_key(perm):
+    """:return: A 64 bit key of a permutation, as two 32 bit halves, stable across processes"""
+    digest = hashlib.blake2b(bytes(perm), digest_size=8).digest()
+    return int.from_bytes(digest[:4], 'little'), int.from_bytes(digest[4:], 'little')
+
+
+def _peephole_table():
+    """Find a shortest sequence of _PEEPHOLE_MOVES for every permutation that has one of up to
+    PEEPHOLE_DEPTH face turns, by a breadth first search from the identity. Of the sequences
+    with the fewest face turns, the one with the fewest quarter turns is kept.
+
+    :return: An array of _PEEPHOLE_SLOTS slots of three items: the two halves of the key of a
+        permutation, and its sequence as the digits of a base 19 number, each an index into
+        _PEEPHOLE_MOVES plus one, or _EMPTY_SLOT. A permutation is in the first slot from
+        (low half of its key) % _PEEPHOLE_SLOTS on that holds its key or is empty.
+    """
+    # the quarter turns and the sequence of each permutation found so far
+    found = {_IDENTITY: (0, 0)}
+    frontier = [_IDENTITY]
+    for _ in range(PEEPHOLE_DEPTH):
+        level = {}
+        for perm in frontier:
+            quarter_turns, code = found[perm]
+            for m, name in enumerate(_PEEPHOLE_MOVES):
+                after = _GETTERS[name](perm)
+                if after in found:
+                    continue
+                candidate = (quarter_turns + _quarter_turns([name]), code * 19 + m + 1)
+                if after not in level or candidate < level[after]:
+                    level[after] = candidate
+        found.update(level)
+        frontier = list(level)
+
+    table = array('I', [0, 0, _EMPTY_SLOT]) * _PEEPHOLE_SLOTS
+    for perm, (_, code) in found.items():
+        high, low = _peephole_key(perm)
+        slot = low % _PEEPHOLE_SLOTS
+        while table[3 * slot + 2] != _EMPTY_SLOT:
+            slot = (slot + 1) % _PEEPHOLE_SLOTS
+        table[3 * slot:3 * slot + 3] = array('I', [high, low, code])
+    return table
+
+
+rubik.tables.register('optimize.peephole', _peephole_table)
+
+
+def _peephole_lookup(table, perm):
+    """:return: The shortest sequence of face turns with the permutation, or None if it is not
+        in the table"""
+    high, low = _peephole_key(perm)
+    slot = low % _PEEPHOLE_SLOTS
+    while table[3 * slot + 2] != _EMPTY_SLOT:
+        if table[3 * slot] == high and table[3 * slot + 1] == low:
+            code, names = table[3 * slot + 2], []
+            while code:
+                code, digit = divmod(code, 19)
+                names.append(_PEEPHOLE_MOVES[digit - 1])
+            return names[::-1]
+        slot = (slot + 1) % _PEEPHOLE_SLOTS
+    return None
+
+
+def apply_peephole_optimization(moves, metric=QUARTER_TURN_METRIC):
+    """Replace runs of up to PEEPHOLE_WINDOW face turns with a shorter sequence of face turns
+    that has the same effect, from a table of the shortest sequences of up to
+    PEEPHOLE_DEPTH face turns (built once and kept on disk, see rubik.tables)
+
+    :param moves: A list of move names, which is changed in place
+    :param metric: The metric to count moves in, and to write the replacements in
+    :return: Whether any moves were replaced
+    """
+    table = rubik.tables.load('optimize.peephole')
+    changed = False
+    i = 0
+    while i < len(moves):
+        # the permutation of moves[i:j] for each j
+        perms = []
+        perm = _IDENTITY
+        face_turns = 0
+        for j in range(i, len(moves)):
+            getter = _GETTERS.get(cube._MOVE_NAME.get(moves[j]))
+            face_turns += j == i or moves[j] != moves[j - 1]
+            if getter is None or face_turns > PEEPHOLE_WINDOW:
+                break
+            perm = getter(perm)
+            perms.append(perm)
+
+        # the longest run that has a shorter replacement
+        for length in range(len(perms), 1, -1):
+            replacement = _peephole_lookup(table, perms[length - 1])
+            if replacement is None:
+                continue
+            replacement = _in_metric(replacement, metric)
+            if _cost(replacement, metric) >= _cost(moves[i:i + length], metric):
+                continue
+            check = _IDENTITY
+            for name in replacement:
+                check = _GETTERS[name](check)
+            if check != perms[length - 1]:
+                # two permutations with the same key
+                continue
+            moves[i:i + length] = replacement
+            changed = True
+            # the replacement may give a shorter run with the moves before it
+            i = max(i - PEEPHOLE_WINDOW + 1, 0)
+            break
+        else:
+            i += 1
+    return changed
+
+
 if __name__ == '__main__':
     test_seq_1 = ("Li Li E L Ei Li B Ei R E Ri Z E L Ei Li Zi U U Ui Ui Ui B U B B B Bi "
                   "Ri B R Z U U Ui Ui Ui B U B B B Ri B B R Bi Bi D Bi Di Z Ri B B R Bi "
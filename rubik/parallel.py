@@ -0,0 +1,84 @@
+"""Solve a cube from every whole cube orientation at once and keep the shortest solution.
+
+The layer-by-layer Solver builds the cross on the front face, and the length of its solution
+depends a lot on which face that is. solve() runs it from each of the ORIENTATIONS starting
+orientations (so each face, with each of its four rotations, starts in front) on a process
+pool, shortens each solution with optimize_moves, and returns the shortest.
+
+The pool is created on first use and kept for later calls, so only the first call pays for
+starting the processes. Call shutdown() to stop it early; it is also stopped at exit.
+"""
+import atexit
+import concurrent.futures
+
+from rubik import cube
+from rubik.optimize import optimize_moves
+from rubik.solve import ORIENTATIONS, Solver
+
+_pool = None
+
+
+def get_pool(processes=None):
+    """
+    :param processes: The number of worker processes if the pool has to be created, by
+        default the number of CPUs
+    :return: The shared process pool
+    """
+    global _pool
+    if _pool is None:
+        _pool = concurrent.futures.ProcessPoolExecutor(processes)
+        atexit.register(shutdown)
+    return _pool
+
+
+def shutdown():
+    """Stop the shared process pool. The next call to solve() starts a new one."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown()
+        _pool = None
+
+
+def _solve_from(cube_str, orientation):
+    solver = Solver(cube.Cube(cube_str), orientation)
+    solver.solve()
+    return optimize_moves(solver.moves)
+
+
+def solve(c, orientations=range(ORIENTATIONS), pool=None):
+    """Find the shortest optimized Solver solution for the Cube c over several starting
+    orientations. The cube is not changed.
+
+    :param orientations: The orientations to try, as indices from 0 to ORIENTATIONS - 1
+    :param pool: A concurrent.futures executor to run the solvers on, by default the shared
+        process pool
+    :return: A pair of the moves, like Solver.moves, and the orientation they came from
+    """
+    if pool is None:
+        pool = get_pool()
+    cube_str = c.flat_str()
+    orientations = list(orientations)
+    results = pool.map(_solve_from, [cube_str] * len(orientations), orientations)
+    moves, orientation = min(zip(results, orientations), key=lambda result: len(result[0]))
+    return moves, orientation
+
+
+class OrientationSolver:
+    """A drop-in alternative to rubik.solve.Solver that tries every starting orientation"""
+
+    def __init__(self, c, orientations=range(ORIENTATIONS), pool=None):
+        """
+        :param orientations: The orientations to try, as indices from 0 to ORIENTATIONS - 1
+        :param pool: A concurrent.futures executor, by default the shared process pool
+        """
+        self.cube = c
+        self.orientations = orientations
+        self.pool = pool
+        self.moves = []
+        self.orientation = None
+
+    def solve(self):
+        """Solve the cube and record the shortest solution in self.moves, and the
+        orientation it came from in self.orientation"""
+        self.moves, self.orientation = solve(self.cube, self.orientations, self.pool)
+        self.cube.sequence(" ".join(self.moves))
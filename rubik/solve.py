@@ -1,15 +1,281 @@
-from rubik import cube
+import functools
+import operator
+import time
+
+import rubik.tables
+from rubik import cube, cubie, validate
+from rubik.instrument import CountingCube, StageStats
 from rubik.maths import Point
 
 DEBUG = False
 
+_QUARTER_ROTATIONS = ("X", "Xi", "Y", "Yi", "Z", "Zi")
+_ROTATIONS = _QUARTER_ROTATIONS + ("X2", "Y2", "Z2")
+
+
+def _inverse(moves):
+    """:return: An Algorithm that undoes the moves, a sequence of move names"""
+    # a half turn undoes itself
+    return cube.Algorithm([m[0] if m.endswith("i") else m if m.endswith("2") else m + "i"
+                           for m in reversed(moves)])
+
+
+def _build_frames():
+    """
+    :return: The 24 orientations (frames) of the cube as facelet permutations, the index of
+        the frame after each rotation from each frame, an Algorithm of rotations that turns the
+        cube into each frame, and an Algorithm that undoes each frame
+    """
+    identity = tuple(range(54))
+    frames, paths, index, after = [identity], [()], {identity: 0}, []
+    for frame, path in zip(frames, paths):
+        for rotation in _QUARTER_ROTATIONS:
+            perm = cube.compose_permutations(frame, cube.MOVE_TABLES[rotation])
+            if perm not in index:
+                index[perm] = len(frames)
+                frames.append(perm)
+                paths.append(path + (rotation,))
+    for frame in frames:
+        after.append({rotation: index[cube.compose_permutations(frame, cube.MOVE_TABLES[rotation])]
+                      for rotation in _ROTATIONS})
+    rotate = [cube.Algorithm(path) for path in paths]
+    undo = [_inverse(path) for path in paths]
+    return frames, after, rotate, undo
+
+
+_FRAMES, _FRAME_AFTER, _FRAME_ROTATIONS, _FRAME_UNDO = _build_frames()
+
+# The number of whole cube orientations the solver can start from
+ORIENTATIONS = len(_FRAMES)
+
+
+def _frame_relabeling(frame):
+    """:return: The move with the same effect on the original cube as each move in the frame"""
+    name_of = {perm: name for name, perm in cube.MOVE_TABLES.items() if name not in _ROTATIONS}
+    inverse = cube.invert_permutation(frame)
+    return {name: name_of[cube.compose_permutations(frame, perm, inverse)] for perm, name in name_of.items()}
+
+
+# For each frame, the move with the same effect on the original cube as each face and slice move
+_FRAME_MOVES = tuple(_frame_relabeling(frame) for frame in _FRAMES)
+
+
+@functools.lru_cache(maxsize=1024)
+def _relabel(frame, algorithm):
+    """
+    :return: The moves of the algorithm in the original frame of the cube, without whole
+        cube rotations, and the frame after the algorithm
+    """
+    names = []
+    for name in algorithm.moves:
+        if name in _ROTATIONS:
+            frame = _FRAME_AFTER[frame][name]
+        else:
+            names.append(_FRAME_MOVES[frame][name])
+    return cube.Algorithm(names), frame
+
+# The longer move sequences the solver uses, each parsed once
+_MIDDLE_EDGE_TO_LEFT = cube.Algorithm("B L Bi Li Bi Di B D")
+_MIDDLE_EDGE_TO_DOWN = cube.Algorithm("Bi Di B D B L Bi Li")
+# with corners of the UP face numbered 4-3 over 2-1, swap 1 and 2, or 1 and 3
+_CORNER_SWAP_1_2 = cube.Algorithm("Li Fi L D F Di Li F L F F")
+_CORNER_SWAP_1_3 = cube.Algorithm("F Li Fi L D F Di Li F L F")
+_CORNER_TWIST_1 = cube.Algorithm("Ri Fi R Fi Ri F F R F F")
+_CORNER_TWIST_2 = cube.Algorithm("R F Ri F R F F Ri F F")
+_EDGE_CYCLE = cube.Algorithm("R R F D Ui R R Di U F R R")
+_H_PATTERN = cube.Algorithm("Ri S Ri Ri S S Ri Fi Fi R Si Si Ri Ri Si R Fi Fi")
+_FISH = "Di Li " + _H_PATTERN + "L D"
+
+
+def _last_layer_slots():
+    """
+    :return: The facelets of each corner slot and each edge slot of the last layer, once it
+        has been turned to the front, with the front facelet first. Each slot is the image of
+        the one before it under F, so the orientations of the pieces are all measured alike.
+    """
+    f_move = cube.MOVE_TABLES["F"]
+    corners, edges = [(14, 8, 15)], [(13, 7)]
+    for _ in range(3):
+        corners.append(tuple(f_move.index(f) for f in corners[-1]))
+        edges.append(tuple(f_move.index(f) for f in edges[-1]))
+    return tuple(corners), tuple(edges)
+
+
+_LL_CORNERS, _LL_EDGES = _last_layer_slots()
+_LL_FACELETS = tuple(sorted(f for slot in _LL_CORNERS + _LL_EDGES for f in slot))
+
+
+def _last_layer_algorithms():
+    """:return: The algorithms the last layer is solved with, and their inverses. Each one
+        leaves the first two layers alone."""
+    algorithms = []
+    for algorithm in ("F", "D F R Fi Ri Di", "D R F Ri Fi Di", _CORNER_SWAP_1_2, _CORNER_SWAP_1_3,
+                      _CORNER_TWIST_1, _CORNER_TWIST_2, _EDGE_CYCLE, _H_PATTERN, _FISH):
+        algorithm = cube.to_algorithm(algorithm)
+        for a in (algorithm, _inverse(algorithm.moves)):
+            if a not in algorithms:
+                algorithms.append(a)
+    return tuple(algorithms)
+
+
+_LL_ALGORITHMS = _last_layer_algorithms()
+
+# Entries of the last layer table that are not indices into _LL_ALGORITHMS
+_LL_SOLVED = 0xfe
+_LL_UNREACHABLE = 0xff
+
+
+def _face_center(f):
+    """:return: The center facelet of the face that facelet f is on"""
+    if f < 9:
+        return 4
+    if f >= 45:
+        return 49
+    return 22 + 3 * ((f - 9) % 12 // 3)
+
+
+def _last_layer_pieces(solved):
+    """
+    :param solved: A function that gives the label (e.g. the color) of each facelet of the
+        solved cube
+    :return: Two dicts that map the labels of a corner slot, and of an edge slot, to the piece
+        in it and its orientation
+    """
+    pieces = []
+    for slots in (_LL_CORNERS, _LL_EDGES):
+        by_labels = {}
+        for piece, slot in enumerate(slots):
+            labels = tuple(solved(f) for f in slot)
+            for twist in range(len(slot)):
+                # the front label is at position twist of the slot
+                by_labels[labels[-twist:] + labels[:-twist]] = piece, twist
+        pieces.append(by_labels)
+    return pieces
+
+
+def _rank(perm):
+    r = 0
+    for i in range(4):
+        r = r * (4 - i) + sum(1 for j in range(i + 1, 4) if perm[j] < perm[i])
+    return r
+
+
+def _last_layer_index(labels, corner_pieces, edge_pieces):
+    """
+    :param labels: The label of each facelet of the cube
+    :return: The index of the last layer case in the last layer table
+    :raises ValueError: If the last layer does not hold each piece once, with a valid orientation
+    """
+    try:
+        corners = [corner_pieces[tuple(labels[f] for f in slot)] for slot in _LL_CORNERS]
+        edges = [edge_pieces[tuple(labels[f] for f in slot)] for slot in _LL_EDGES]
+    except KeyError:
+        raise ValueError("a last layer piece does not exist") from None
+    cp, co = zip(*corners)
+    ep, eo = zip(*edges)
+    if len(set(cp)) < 4 or len(set(ep)) < 4:
+        raise ValueError("a last layer piece appears twice")
+    if sum(co) % 3 or sum(eo) % 2:
+        raise ValueError("a last layer piece is twisted or flipped")
+    return ((_rank(cp) * 27 + co[0] * 9 + co[1] * 3 + co[2]) * 24 + _rank(ep)) * 8 + eo[0] * 4 + eo[1] * 2 + eo[2]
+
+
+def _last_layer_table():
+    """Find the shortest way to solve each last layer case with _LL_ALGORITHMS, counting
+    moves, by a search outward from the solved cube (Dijkstra's algorithm).
+
+    :return: A bytearray with the index into _LL_ALGORITHMS of the first algorithm to apply in
+        each case, _LL_SOLVED for the solved case and _LL_UNREACHABLE for impossible cases
+    """
+    # A state is the facelet of the solved cube that each facelet of the last layer came from
+    position = {f: i for i, f in enumerate(_LL_FACELETS)}
+    undo = []
+    for algorithm in _LL_ALGORITHMS:
+        permutation = _inverse(algorithm.moves).permutation
+        undo.append(operator.itemgetter(*(position[permutation[f]] for f in _LL_FACELETS)))
+    costs = [len(algorithm) for algorithm in _LL_ALGORITHMS]
+    pieces = _last_layer_pieces(lambda f: f)
+    labels = list(range(54))
+
+    solved = _LL_FACELETS
+    table = bytearray([_LL_UNREACHABLE]) * (24 * 27 * 24 * 8)
+    distance = {solved: 0}
+    # the states at each distance
+    buckets = [[solved]]
+    d = 0
+    while d < len(buckets):
+        for state in buckets[d]:
+            if distance[state] != d:
+                continue
+            for m, (get, cost) in enumerate(zip(undo, costs)):
+                # the state that _LL_ALGORITHMS[m] turns into state
+                before = get(state)
+                if distance.get(before, d + cost + 1) <= d + cost:
+                    continue
+                distance[before] = d + cost
+                for f, label in zip(_LL_FACELETS, before):
+                    labels[f] = label
+                table[_last_layer_index(labels, *pieces)] = m
+                buckets.extend([] for _ in range(d + cost + 1 - len(buckets)))
+                buckets[d + cost].append(before)
+        d += 1
+    table[_last_layer_index(range(54), *pieces)] = _LL_SOLVED
+    return table
+
+
+# shipped with the package in rubik/data, so a Solver never has to build it
+rubik.tables.register("solve.last_layer", _last_layer_table)
+
+
+# The stages of a solve, in order, as Solver method names
+STAGES = ("cross", "cross_corners", "second_layer", "last_layer")
+
+
+def _stage_goals():
+    """
+    :return: For each stage, the facelets that are solved once it is done, each with the
+        center facelet of its face. The goal of each stage includes the goals before it.
+    """
+    def facelets(pieces, wanted):
+        return [f for piece in pieces if wanted({cubie.FACELET_FACES[f] for f in piece}) for f in piece]
+
+    solved = {
+        "cross": facelets(cubie.EDGE_FACELETS, lambda faces: cubie.F in faces),
+        "cross_corners": facelets(cubie.CORNER_FACELETS, lambda faces: cubie.F in faces),
+        "second_layer": facelets(cubie.EDGE_FACELETS, lambda faces: not faces & {cubie.F, cubie.B}),
+        "last_layer": range(54),
+    }
+    goals, goal = {}, set()
+    for stage in STAGES:
+        goal |= set(solved[stage])
+        goals[stage] = tuple((f, cubie.CENTER_FACELETS[cubie.FACELET_FACES[f]]) for f in sorted(goal))
+    return goals
+
+
+_STAGE_GOALS = _stage_goals()
+
 
 class Solver:
 
-    def __init__(self, c):
-        self.cube = c
+    def __init__(self, c, orientation=0, on_stage=None):
+        """
+        :param orientation: The whole cube orientation (0 to ORIENTATIONS - 1) to solve the
+            cube from. The solver builds the cross on the face that is in front in that
+            orientation, and different orientations give solutions of different lengths.
+        :param on_stage: If given, a function that is called with a rubik.instrument.StageStats
+            after each stage of solve(), such as a rubik.instrument.StageReport
+        """
+        # The solver works on a copy of c, which it turns freely, including whole cube
+        # rotations. It keeps track of the copy's orientation as a frame, and applies each
+        # face and slice move to c relabeled for that frame, so self.moves never contains
+        # X, Y or Z.
+        self.target = c
+        self.cube = cube.Cube(c) if on_stage is None else CountingCube(c)
+        self.on_stage = on_stage
+        self.frame = 0
         self.colors = c.colors()
         self.moves = []
+        self.move(_FRAME_ROTATIONS[orientation])
 
         self.left_piece  = self.cube.find_piece(self.cube.left_color())
         self.right_piece = self.cube.find_piece(self.cube.right_color())
@@ -19,25 +285,58 @@ class Solver:
         self.inifinite_loop_max_iterations = 12
 
     def solve(self):
+        """Solve the cube and record the solution in self.moves
+
+        :raises rubik.validate.UnsolvableCubeError: If the cube can not be solved
+        """
+        validate.check(self.cube)
         if DEBUG: print(self.cube)
-        self.cross()
-        if DEBUG: print('Cross:\n', self.cube)
-        self.cross_corners()
-        if DEBUG: print('Corners:\n', self.cube)
-        self.second_layer()
-        if DEBUG: print('Second layer:\n', self.cube)
-        self.back_face_edges()
-        if DEBUG: print('Last layer edges\n', self.cube)
-        self.last_layer_corners_position()
-        if DEBUG: print('Last layer corners -- position\n', self.cube)
-        self.last_layer_corners_orientation()
-        if DEBUG: print('Last layer corners -- orientation\n', self.cube)
-        self.last_layer_edges()
-        if DEBUG: print('Solved\n', self.cube)
+        for stage in STAGES:
+            # skips the stages already done, including every stage if the cube is solved
+            if self.satisfied(stage):
+                continue
+            if self.on_stage is None:
+                getattr(self, stage)()
+            else:
+                self._measure(stage)
+            if DEBUG: print(stage + ':\n', self.cube)
+        self.cube.sequence(_FRAME_UNDO[self.frame])
+        self.frame = 0
+
+    def satisfied(self, stage):
+        """
+        :param stage: One of STAGES
+        :return: Whether the cube is as it would be after the stage: the stage's pieces, and
+            those of every stage before it, are in place
+        """
+        colors = self.cube.flat_str()
+        return all(colors[f] == colors[center] for f, center in _STAGE_GOALS[stage])
+
+    def first_unsatisfied_stage(self):
+        """:return: The first stage in STAGES that is not satisfied, where solve() starts, or
+            None if the cube is solved"""
+        for stage in STAGES:
+            if not self.satisfied(stage):
+                return stage
+        return None
+
+    def _measure(self, stage):
+        c = self.cube
+        moves, permutations, lookups = len(self.moves), c.permutations, c.lookups
+        start = time.perf_counter()
+        getattr(self, stage)()
+        seconds = time.perf_counter() - start
+        self.on_stage(StageStats(stage, seconds, len(self.moves) - moves,
+                                 c.permutations - permutations, c.lookups - lookups))
 
     def move(self, move_str):
-        self.moves.extend(move_str.split())
-        self.cube.sequence(move_str)
+        """Apply move_str, a move string or a cube.Algorithm, in the solver's frame, and
+        record each of its moves in the frame of the original cube"""
+        algorithm = cube.to_algorithm(move_str)
+        relabeled, self.frame = _relabel(self.frame, algorithm)
+        self.moves.extend(relabeled.moves)
+        self.cube.sequence(algorithm)
+        self.target.sequence(relabeled)
 
     def cross(self):
         if DEBUG: print("cross")
@@ -121,6 +420,11 @@ class Solver:
         self.move("Z")
 
     def place_frd_corner(self, corner_piece, right_piece, down_piece, front_color):
+        # leave the corner alone if it is already in place
+        if (corner_piece.pos == (right_piece.pos.x, down_piece.pos.y, 1)
+                and corner_piece.colors[2] == front_color):
+            return
+
         # rotate to z = -1
         if corner_piece.pos.z == 1:
             pos = Point(corner_piece.pos)
@@ -178,6 +482,10 @@ class Solver:
         self.move("Z")
 
     def place_middle_layer_ld_edge(self, ld_piece, left_color, down_color):
+        # leave the edge alone if it is already in place
+        if ld_piece.pos == (-1, -1, 0) and ld_piece.colors[0] == left_color:
+            return
+
         # move to z == -1
         if ld_piece.pos.z == 0:
             count = 0
@@ -185,7 +493,7 @@ class Solver:
                 self.move("Z")
                 count += 1
 
-            self.move("B L Bi Li Bi Di B D")
+            self.move(_MIDDLE_EDGE_TO_LEFT)
             for _ in range(count):
                 self.move("Zi")
 
@@ -195,313 +503,36 @@ class Solver:
             # left_color is on the back face, move piece to to down face
             while ld_piece.pos.y != -1:
                 self.move("B")
-            self.move("B L Bi Li Bi Di B D")
+            self.move(_MIDDLE_EDGE_TO_LEFT)
         elif ld_piece.colors[2] == down_color:
             # down_color is on the back face, move to left face
             while ld_piece.pos.x != -1:
                 self.move("B")
-            self.move("Bi Di B D B L Bi Li")
+            self.move(_MIDDLE_EDGE_TO_DOWN)
         else:
             raise Exception("BUG!!")
 
-    def back_face_edges(self):
+    def last_layer(self):
         # rotate BACK to FRONT
         self.move("X X")
 
-        # States:  1     2     3     4
-        #         -B-   -B-   ---   ---
-        #         BBB   BB-   BBB   -B-
-        #         -B-   ---   ---   ---
-        def state1():
-            return (self.cube[0, 1, 1].colors[2] == self.cube.front_color() and
-                    self.cube[-1, 0, 1].colors[2] == self.cube.front_color() and
-                    self.cube[0, -1, 1].colors[2] == self.cube.front_color() and
-                    self.cube[1, 0, 1].colors[2] == self.cube.front_color())
-
-        def state2():
-            return (self.cube[0, 1, 1].colors[2] == self.cube.front_color() and
-                    self.cube[-1, 0, 1].colors[2] == self.cube.front_color())
-
-        def state3():
-            return (self.cube[-1, 0, 1].colors[2] == self.cube.front_color() and
-                    self.cube[1, 0, 1].colors[2] == self.cube.front_color())
-
-        def state4():
-            return (self.cube[0, 1, 1].colors[2] != self.cube.front_color() and
-                    self.cube[-1, 0, 1].colors[2] != self.cube.front_color() and
-                    self.cube[0, -1, 1].colors[2] != self.cube.front_color() and
-                    self.cube[1, 0, 1].colors[2] != self.cube.front_color())
-
-        count = 0
-        while not state1():
-            if state4() or state2():
-                self.move("D F R Fi Ri Di")
-            elif state3():
-                self.move("D R F Ri Fi Di")
-            else:
-                self.move("F")
-            count += 1
-            if count >= self.inifinite_loop_max_iterations:
-                raise Exception("Stuck in loop - unsolvable cube\n" + str(self.cube))
-
-        self.move("Xi Xi")
-
-    def last_layer_corners_position(self):
-        self.move("X X")
-        # UP face:
-        #  4-3
-        #  ---
-        #  2-1
-        move_1 = "Li Fi L D F Di Li F L F F "  # swaps 1 and 2
-        move_2 = "F Li Fi L D F Di Li F L F "  # swaps 1 and 3
-
-        c1 = self.cube.find_piece(self.cube.front_color(), self.cube.right_color(), self.cube.down_color())
-        c2 = self.cube.find_piece(self.cube.front_color(), self.cube.left_color(), self.cube.down_color())
-        c3 = self.cube.find_piece(self.cube.front_color(), self.cube.right_color(), self.cube.up_color())
-        c4 = self.cube.find_piece(self.cube.front_color(), self.cube.left_color(), self.cube.up_color())
-
-        # place corner 4
-        if c4.pos == Point(1, -1, 1):
-            self.move(move_1 + "Zi " + move_1 + " Z")
-        elif c4.pos == Point(1, 1, 1):
-            self.move("Z " + move_2 + " Zi")
-        elif c4.pos == Point(-1, -1, 1):
-            self.move("Zi " + move_1 + " Z")
-        assert c4.pos == Point(-1, 1, 1)
-
-        # place corner 2
-        if c2.pos == Point(1, 1, 1):
-            self.move(move_2 + move_1)
-        elif c2.pos == Point(1, -1, 1):
-            self.move(move_1)
-        assert c2.pos == Point(-1, -1, 1)
-
-        # place corner 3 and corner 1
-        if c3.pos == Point(1, -1, 1):
-            self.move(move_2)
-        assert c3.pos == Point(1, 1, 1)
-        assert c1.pos == Point(1, -1, 1)
-
-        self.move("Xi Xi")
-
-    def last_layer_corners_orientation(self):
-        self.move("X X")
-
-        # States:  1        2      3      4      5      6      7      8
-        #           B      B             B      B        B
-        #         BB-      -B-B   BBB    -BB    -BB   B-B-   B-B-B   BBB
-        #         BBB      BBB    BBB    BBB    BBB    BBB    BBB    BBB
-        #         -B-B     BB-    -B-    -BB    BB-B  B-B-   B-B-B   BBB
-        #         B          B    B B    B               B
-        def state1():
-            return (self.cube[ 1,  1, 1].colors[1] == self.cube.front_color() and
-                    self.cube[-1, -1, 1].colors[1] == self.cube.front_color() and
-                    self.cube[ 1, -1, 1].colors[0] == self.cube.front_color())
-
-        def state2():
-            return (self.cube[-1,  1, 1].colors[1] == self.cube.front_color() and
-                    self.cube[ 1,  1, 1].colors[0] == self.cube.front_color() and
-                    self.cube[ 1, -1, 1].colors[1] == self.cube.front_color())
-
-        def state3():
-            return (self.cube[-1, -1, 1].colors[1] == self.cube.front_color() and
-                    self.cube[ 1, -1, 1].colors[1] == self.cube.front_color() and
-                    self.cube[-1,  1, 1].colors[2] == self.cube.front_color() and
-                    self.cube[ 1,  1, 1].colors[2] == self.cube.front_color())
-
-        def state4():
-            return (self.cube[-1,  1, 1].colors[1] == self.cube.front_color() and
-                    self.cube[-1, -1, 1].colors[1] == self.cube.front_color() and
-                    self.cube[ 1,  1, 1].colors[2] == self.cube.front_color() and
-                    self.cube[ 1, -1, 1].colors[2] == self.cube.front_color())
-
-        def state5():
-            return (self.cube[-1,  1, 1].colors[1] == self.cube.front_color() and
-                    self.cube[ 1, -1, 1].colors[0] == self.cube.front_color())
-
-        def state6():
-            return (self.cube[ 1,  1, 1].colors[1] == self.cube.front_color() and
-                    self.cube[ 1, -1, 1].colors[1] == self.cube.front_color() and
-                    self.cube[-1, -1, 1].colors[0] == self.cube.front_color() and
-                    self.cube[-1,  1, 1].colors[0] == self.cube.front_color())
-
-        def state7():
-            return (self.cube[ 1,  1, 1].colors[0] == self.cube.front_color() and
-                    self.cube[ 1, -1, 1].colors[0] == self.cube.front_color() and
-                    self.cube[-1, -1, 1].colors[0] == self.cube.front_color() and
-                    self.cube[-1,  1, 1].colors[0] == self.cube.front_color())
-
-        def state8():
-            return (self.cube[ 1,  1, 1].colors[2] == self.cube.front_color() and
-                    self.cube[ 1, -1, 1].colors[2] == self.cube.front_color() and
-                    self.cube[-1, -1, 1].colors[2] == self.cube.front_color() and
-                    self.cube[-1,  1, 1].colors[2] == self.cube.front_color())
-
-        move_1 = "Ri Fi R Fi Ri F F R F F "
-        move_2 = "R F Ri F R F F Ri F F "
-
-        count = 0
-        while not state8():
-            if state1(): self.move(move_1)
-            elif state2(): self.move(move_2)
-            elif state3(): self.move(move_2 + "F F " + move_1)
-            elif state4(): self.move(move_2 + move_1)
-            elif state5(): self.move(move_1 + "F " + move_2)
-            elif state6(): self.move(move_1 + "Fi " + move_1)
-            elif state7(): self.move(move_1 + "F F " + move_1)
-            else:
-                self.move("F")
-
-            count += 1
-            if count >= self.inifinite_loop_max_iterations:
-                raise Exception("Stuck in loop - unsolvable cube:\n" + str(self.cube))
-
-        # rotate corners into correct locations (cube is inverted, so swap up and down colors)
-        bru_corner = self.cube.find_piece(self.cube.front_color(), self.cube.right_color(), self.cube.up_color())
-        while bru_corner.pos != Point(1, 1, 1):
-            self.move("F")
-
-        self.move("Xi Xi")
-
-    def last_layer_edges(self):
-        self.move("X X")
-
-        br_edge = self.cube.find_piece(self.cube.front_color(), self.cube.right_color())
-        bl_edge = self.cube.find_piece(self.cube.front_color(), self.cube.left_color())
-        bu_edge = self.cube.find_piece(self.cube.front_color(), self.cube.up_color())
-        bd_edge = self.cube.find_piece(self.cube.front_color(), self.cube.down_color())
-
-        # States:
-        #       1              2
-        #      ---            ---
-        #      ---            ---
-        #      -B-            -a-
-        #  --- B-B ---    aaa BBB ---
-        #  --B -B- B--    aaB -B- B--
-        #  --- B-B ---    aaa B-B ---
-        #      -B-            -B-
-        #      ---            ---
-        #      ---            ---
-        #              (aB edge on any FRONT)
-        def state1():
-            return (bu_edge.colors[2] != self.cube.front_color() and
-                    bd_edge.colors[2] != self.cube.front_color() and
-                    bl_edge.colors[2] != self.cube.front_color() and
-                    br_edge.colors[2] != self.cube.front_color())
-
-        def state2():
-            return (bu_edge.colors[2] == self.cube.front_color() or
-                    bd_edge.colors[2] == self.cube.front_color() or
-                    bl_edge.colors[2] == self.cube.front_color() or
-                    br_edge.colors[2] == self.cube.front_color())
-
-
-        cycle_move = "R R F D Ui R R Di U F R R"
-        h_pattern_move = "Ri S Ri Ri S S Ri Fi Fi R Si Si Ri Ri Si R Fi Fi "
-        fish_move = "Di Li " + h_pattern_move + " L D"
-
-        if state1():
-            # ideally, convert state1 into state2
-            self._handle_last_layer_state1(br_edge, bl_edge, bu_edge, bd_edge, cycle_move, h_pattern_move)
-        if state2():
-            self._handle_last_layer_state2(br_edge, bl_edge, bu_edge, bd_edge, cycle_move)
-
-        def h_pattern1():
-            return (self.cube[-1,  0, 1].colors[0] != self.cube.left_color() and
-                    self.cube[ 1,  0, 1].colors[0] != self.cube.right_color() and
-                    self.cube[ 0, -1, 1].colors[1] == self.cube.down_color() and
-                    self.cube[ 0,  1, 1].colors[1] == self.cube.up_color())
-
-        def h_pattern2():
-            return (self.cube[-1,  0, 1].colors[0] == self.cube.left_color() and
-                    self.cube[ 1,  0, 1].colors[0] == self.cube.right_color() and
-                    self.cube[ 0, -1, 1].colors[1] == self.cube.front_color() and
-                    self.cube[ 0,  1, 1].colors[1] == self.cube.front_color())
-
-        def fish_pattern():
-            return (self.cube[cube.FRONT + cube.DOWN].colors[2] == self.cube.down_color() and
-                    self.cube[cube.FRONT + cube.RIGHT].colors[2] == self.cube.right_color() and
-                    self.cube[cube.FRONT + cube.DOWN].colors[1] == self.cube.front_color() and
-                    self.cube[cube.FRONT + cube.RIGHT].colors[0] == self.cube.front_color())
-
-        count = 0
-        while not self.cube.is_solved():
-            for _ in range(4):
-                if fish_pattern():
-                    self.move(fish_move)
-                    if self.cube.is_solved():
-                        return
-                else:
-                    self.move("Z")
-
-            if h_pattern1():
-                self.move(h_pattern_move)
-            elif h_pattern2():
-                self.move("Z " + h_pattern_move + "Zi")
-            else:
-                self.move(cycle_move)
-            count += 1
-            if count >= self.inifinite_loop_max_iterations:
-                raise Exception("Stuck in loop - unsolvable cube:\n" + str(self.cube))
-
-        self.move("Xi Xi")
-
-
-    def _handle_last_layer_state1(self, br_edge, bl_edge, bu_edge, bd_edge, cycle_move, h_move):
-        if DEBUG: print("_handle_last_layer_state1")
-        def check_edge_lr():
-            return self.cube[cube.LEFT + cube.FRONT].colors[2] == self.cube.left_color()
-
-        count = 0
-        while not check_edge_lr():
-            self.move("F")
-            count += 1
-            if count == 4:
-                raise Exception("Bug: Failed to handle last layer state1")
-
-        self.move(h_move)
-
-        for _ in range(count):
-            self.move("Fi")
-
-
-    def _handle_last_layer_state2(self, br_edge, bl_edge, bu_edge, bd_edge, cycle_move):
-        if DEBUG: print("_handle_last_layer_state2")
-        def correct_edge():
-            piece = self.cube[cube.LEFT + cube.FRONT]
-            if piece.colors[2] == self.cube.front_color() and piece.colors[0] == self.cube.left_color():
-                return piece
-            piece = self.cube[cube.RIGHT + cube.FRONT]
-            if piece.colors[2] == self.cube.front_color() and piece.colors[0] == self.cube.right_color():
-                return piece
-            piece = self.cube[cube.UP + cube.FRONT]
-            if piece.colors[2] == self.cube.front_color() and piece.colors[1] == self.cube.up_color():
-                return piece
-            piece = self.cube[cube.DOWN + cube.FRONT]
-            if piece.colors[2] == self.cube.front_color() and piece.colors[1] == self.cube.down_color():
-                return piece
-
-        count = 0
+        # the colors of the solved cube: each facelet has the color of its face's center
+        colors = self.cube.flat_str()
+        pieces = _last_layer_pieces(lambda f: colors[_face_center(f)])
+        table = rubik.tables.load("solve.last_layer")
         while True:
-            edge = correct_edge()
-            if edge is None:
-                self.move(cycle_move)
-            else:
+            # the message matches the other stages', which fail by looping
+            try:
+                case = table[_last_layer_index(self.cube.flat_str(), *pieces)]
+            except ValueError as e:
+                raise Exception(f"Stuck in loop - unsolvable cube ({e})\n{self.cube}") from None
+            if case == _LL_SOLVED:
                 break
+            if case == _LL_UNREACHABLE:
+                raise Exception("Stuck in loop - unsolvable cube (two pieces are swapped)\n" + str(self.cube))
+            self.move(_LL_ALGORITHMS[case])
 
-            count += 1
-
-            if count % 3 == 0:
-                self.move("Z")
-
-            if count >= self.inifinite_loop_max_iterations:
-                raise Exception("Stuck in loop - unsolvable cube:\n" + str(self.cube))
-
-        while edge.pos != Point(-1, 0, 1):
-            self.move("Z")
-
-        assert self.cube[cube.LEFT + cube.FRONT].colors[2] == self.cube.front_color() and \
-               self.cube[cube.LEFT + cube.FRONT].colors[0] == self.cube.left_color()
+        self.move("Xi Xi")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,236 @@
+"""Tables that are built once and kept on disk.
+
+Solvers register each of their tables with register(), giving a function that builds it.
+load() opens the table file with mmap, so it is ready without reading the file, its pages
+are only read when they are first touched, and processes that use the same table share
+its pages. If the file is missing or out of date, the table is built and written first.
+
+A table file is a 32 byte header followed by the items of the table:
+
+    magic       8 bytes   b"RUBIKTBL"
+    version     uint32    FORMAT_VERSION
+    typecode    1 byte    the array typecode of the items: b"B", b"H" or b"I"
+    byte order  1 byte    b"<" or b">"
+    padding     2 bytes
+    count       uint64    the number of items
+    checksum    uint32    the CRC-32 of the items
+    padding     4 bytes
+
+Tables are kept in the directory given by the RUBIK_TABLE_DIR environment variable, or in
+~/.cache/rubik-cube. Run `python -m rubik.tables generate` to build all of them ahead of time.
+
+Small tables that a plain Solver needs are shipped with the package, in rubik/data, and are
+loaded from there first. After changing one, increase its version and regenerate it with
+`python -m rubik.tables generate --force --dir rubik/data <name>`.
+"""
+import argparse
+import importlib
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import zlib
+from array import array
+
+MAGIC = b"RUBIKTBL"
+FORMAT_VERSION = 1
+
+_HEADER_FORMAT = "<8sIcc2xQI4x"
+_HEADER_SIZE = 32
+_BYTE_ORDER = b"<" if sys.byteorder == "little" else b">"
+
+# The directory of the tables shipped with the package
+PACKAGE_TABLE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+# The modules that register tables, imported by the command line interface
+_PROVIDERS = ("rubik.solve", "rubik.twophase", "rubik.optimal", "rubik.optimize")
+
+
+class _Spec:
+
+    def __init__(self, name, build, version):
+        self.name = name
+        self.build = build
+        self.version = version
+
+
+_registry = {}
+_loaded = {}
+
+
+def register(name, build, version=1):
+    """Register a table
+
+    :param name: A unique name for the table, e.g. "twophase.twist_move"
+    :param build: A function that returns the table as a bytearray or an array with
+        typecode "B", "H" or "I"
+    :param version: Increase this whenever build() changes, so that stale files are rebuilt
+    """
+    _registry[name] = _Spec(name, build, version)
+
+
+def registered():
+    """:return: The names of the registered tables, sorted"""
+    return sorted(_registry)
+
+
+def table_dir():
+    """:return: The directory that tables are kept in"""
+    return os.environ.get("RUBIK_TABLE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "rubik-cube")
+
+
+def table_path(name, directory=None):
+    """:return: The path of the file for the registered table with the given name"""
+    spec = _registry[name]
+    return os.path.join(directory or table_dir(), f"{name}.v{spec.version}.tbl")
+
+
+def _find_table(name):
+    """:return: The path of the file load() reads first for the registered table with the given
+        name: the one shipped with the package if there is one, else the one in table_dir()"""
+    shipped = table_path(name, PACKAGE_TABLE_DIR)
+    return shipped if os.path.exists(shipped) else table_path(name)
+
+
+def load(name):
+    """
+    :return: The registered table with the given name, as a read-only memoryview of its file.
+        If the file can not be written, the table is built and kept in memory instead.
+    """
+    table = _loaded.get(name)
+    if table is None:
+        table = _loaded[name] = _open_or_build(name)
+    return table
+
+
+def _open_or_build(name):
+    path = table_path(name)
+    for existing in (_find_table(name), path):
+        try:
+            return open_table(existing)
+        except (OSError, ValueError):
+            pass
+    data = _registry[name].build()
+    try:
+        write_table(path, data)
+        return open_table(path)
+    except OSError:
+        return data
+
+
+def _typecode(data):
+    if isinstance(data, (bytes, bytearray)):
+        return "B"
+    if data.typecode not in ("B", "H", "I"):
+        raise ValueError(f"Unsupported table typecode {data.typecode!r}")
+    return data.typecode
+
+
+def write_table(path, data):
+    """Write a table file atomically
+
+    :param data: A bytearray or an array with typecode "B", "H" or "I"
+    """
+    typecode = _typecode(data)
+    body = bytes(data) if typecode == "B" else data.tobytes()
+    header = struct.pack(_HEADER_FORMAT, MAGIC, FORMAT_VERSION, typecode.encode("ascii"), _BYTE_ORDER,
+                         len(data), zlib.crc32(body))
+
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(header)
+            f.write(body)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _read_header(f):
+    data = f.read(_HEADER_SIZE)
+    if len(data) != _HEADER_SIZE:
+        raise ValueError("Table file is too short")
+    magic, version, typecode, byte_order, count, checksum = struct.unpack(_HEADER_FORMAT, data)
+    if magic != MAGIC:
+        raise ValueError("Not a table file")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Table file has format version {version}, expected {FORMAT_VERSION}")
+    if byte_order != _BYTE_ORDER:
+        raise ValueError("Table file was written on a machine with a different byte order")
+    return typecode.decode("ascii"), count, checksum
+
+
+def open_table(path):
+    """
+    :return: A read-only memoryview of the items in the table file, backed by mmap
+    :raises ValueError: If the file is not a valid table file
+    """
+    with open(path, "rb") as f:
+        typecode, count, _ = _read_header(f)
+        itemsize = array(typecode).itemsize
+        if os.fstat(f.fileno()).st_size != _HEADER_SIZE + count * itemsize:
+            raise ValueError("Table file has the wrong size")
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return memoryview(mapped)[_HEADER_SIZE:].cast(typecode)
+
+
+def verify_table(path):
+    """
+    :raises ValueError: If the file is not a valid table file, or its checksum does not match
+    """
+    with open(path, "rb") as f:
+        _, _, checksum = _read_header(f)
+        actual = 0
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            actual = zlib.crc32(chunk, actual)
+    if actual != checksum:
+        raise ValueError("Table file checksum does not match")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="rubik-tables", description="Generate and verify solver tables")
+    parser.add_argument("command", choices=("generate", "verify", "list"))
+    parser.add_argument("names", nargs="*", help="The tables to generate, verify or list (default: all)")
+    parser.add_argument("--dir", help="The table directory (default: $RUBIK_TABLE_DIR or ~/.cache/rubik-cube)")
+    parser.add_argument("--force", action="store_true",
+                        help="Rebuild tables that already exist, including those shipped with the package")
+    args = parser.parse_intermixed_args(argv)
+
+    if args.dir:
+        os.environ["RUBIK_TABLE_DIR"] = args.dir
+    for module in _PROVIDERS:
+        importlib.import_module(module)
+    unknown = sorted(set(args.names) - set(registered()))
+    if unknown:
+        parser.error(f"Unknown tables: {' '.join(unknown)}")
+
+    failures = 0
+    for name in args.names or registered():
+        path = _find_table(name)
+        if args.command == "list":
+            print(f"{name}: {path}")
+        elif args.command == "generate":
+            if args.force or not os.path.exists(path):
+                # tables are only written to the table directory, never to the package
+                path = table_path(name)
+                print(f"Generating {name}")
+                write_table(path, _registry[name].build())
+            print(f"{name}: {path}")
+        else:
+            try:
+                verify_table(path)
+                print(f"OK {name}: {path}")
+            except (OSError, ValueError) as e:
+                failures += 1
+                print(f"FAILED {name}: {path}: {e}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    # run as a script, this module is not the rubik.tables that solvers register their tables with
+    sys.exit(importlib.import_module("rubik.tables").main())
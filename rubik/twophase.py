@@ -0,0 +1,254 @@
+"""A two-phase (Kociemba) solver.
+
+Phase 1 turns the cube into the group <U, D, R2, L2, F2, B2>, where all corners and edges
+are oriented and the middle layer edges are in the middle layer. Phase 2 solves the cube
+using only the moves of that group. Both phases are iterative deepening searches over
+coordinates (see rubik.coord), guided by pruning tables that give a lower bound of the
+number of moves to the goal of each phase.
+"""
+import functools
+import operator
+import time
+
+import rubik.tables
+from rubik import coord, cubie, validate
+
+# The number of moves in MOVES, and in PHASE2_MOVES
+_N1 = len(coord.MOVES)
+_N2 = len(coord.PHASE2_MOVES)
+
+# The face (0 to 5 for U, R, F, D, L, B) of each move in MOVES
+_FACE = tuple(m // 3 for m in range(_N1))
+
+_SLICE_SIZE = coord.SLICE.size
+_SLICE_EDGES_SIZE = coord.SLICE_EDGES.size
+
+_tables = None
+
+
+def pruning_table(table_a, size_a, table_b, size_b, n_moves):
+    """Compute the number of moves needed to bring two coordinates to 0 together.
+
+    :param table_a: The move table of the first coordinate, with n_moves moves per value
+    :param table_b: The move table of the second coordinate, with n_moves moves per value.
+        The moves of both tables must include the inverse of each move.
+    :return: A bytearray p where p[a * size_b + b] is the distance of (a, b) from (0, 0)
+    """
+    size = size_a * size_b
+    prune = bytearray(b"\xff") * size
+    prune[0] = 0
+    scaled_a = [x * size_b for x in table_a]
+    frontier = [0]
+    unvisited = size - 1
+    depth = 0
+    while frontier and unvisited:
+        depth += 1
+        next_frontier = []
+        if len(frontier) < unvisited:
+            # search forward from each state at the previous depth
+            for index in frontier:
+                a, b = divmod(index, size_b)
+                a *= n_moves
+                b *= n_moves
+                for j in map(operator.add, scaled_a[a:a + n_moves], table_b[b:b + n_moves]):
+                    if prune[j] == 0xff:
+                        prune[j] = depth
+                        next_frontier.append(j)
+        else:
+            # most states have been seen: check which unseen states are next to a state at
+            # the previous depth
+            index = prune.find(0xff)
+            while index >= 0:
+                a, b = divmod(index, size_b)
+                a *= n_moves
+                b *= n_moves
+                for j in map(operator.add, scaled_a[a:a + n_moves], table_b[b:b + n_moves]):
+                    if prune[j] == depth - 1:
+                        next_frontier.append(index)
+                        break
+                index = prune.find(0xff, index + 1)
+            for index in next_frontier:
+                prune[index] = depth
+        unvisited -= len(next_frontier)
+        frontier = next_frontier
+    return prune
+
+
+def _register_tables():
+    phase1 = tuple(range(_N1))
+    phase2 = coord.PHASE2_MOVES
+    move_tables = (
+        ("twist_move", coord.TWIST, phase1),
+        ("flip_move", coord.FLIP, phase1),
+        ("slice_move", coord.SLICE, phase1),
+        ("corners_move", coord.CORNERS, phase2),
+        ("ud_edges_move", coord.UD_EDGES, phase2),
+        ("slice_edges_move", coord.SLICE_EDGES, phase2),
+    )
+    for name, coordinate, moves in move_tables:
+        rubik.tables.register("twophase." + name, functools.partial(coordinate.move_table, moves))
+
+    prune_tables = (
+        ("twist_slice_prune", "twist_move", coord.TWIST, "slice_move", coord.SLICE, _N1),
+        ("flip_slice_prune", "flip_move", coord.FLIP, "slice_move", coord.SLICE, _N1),
+        ("corners_slice_prune", "corners_move", coord.CORNERS, "slice_edges_move", coord.SLICE_EDGES, _N2),
+        ("ud_edges_slice_prune", "ud_edges_move", coord.UD_EDGES, "slice_edges_move", coord.SLICE_EDGES, _N2),
+    )
+    for name, move_a, coord_a, move_b, coord_b, n_moves in prune_tables:
+        def build(move_a=move_a, size_a=coord_a.size, move_b=move_b, size_b=coord_b.size, n_moves=n_moves):
+            return pruning_table(rubik.tables.load("twophase." + move_a), size_a,
+                                 rubik.tables.load("twophase." + move_b), size_b, n_moves)
+        rubik.tables.register("twophase." + name, build)
+
+
+_register_tables()
+
+
+class _Tables:
+    """The move and pruning tables of both phases, each loaded (see rubik.tables) on first use"""
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        table = rubik.tables.load("twophase." + name)
+        setattr(self, name, table)
+        return table
+
+
+def tables():
+    """:return: The tables of the solver"""
+    global _tables
+    if _tables is None:
+        _tables = _Tables()
+    return _tables
+
+
+class _Search:
+
+    def __init__(self, cubies, max_length, deadline):
+        self.t = tables()
+        self.cubies = cubies
+        self.max_length = max_length
+        self.deadline = deadline
+        self.moves = []
+        self.solution = None
+        # True if the search stopped at the deadline, rather than after trying every length
+        self.timed_out = False
+
+    def run(self):
+        t = self.t
+        twist, flip, slice_ = (c.get(self.cubies) for c in (coord.TWIST, coord.FLIP, coord.SLICE))
+        start = max(t.twist_slice_prune[twist * _SLICE_SIZE + slice_],
+                    t.flip_slice_prune[flip * _SLICE_SIZE + slice_])
+        for length in range(start, self.max_length + 1):
+            if self._phase1(twist, flip, slice_, length, -1):
+                break
+        return self.solution
+
+    def _timed_out(self):
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            self.timed_out = True
+        return self.timed_out
+
+    def _phase1(self, twist, flip, slice_, togo, last_face):
+        """:return: True to stop the search"""
+        t = self.t
+        if togo == 0:
+            if twist == flip == slice_ == 0 and (not self.moves or self.moves[-1] not in coord.PHASE2_MOVES):
+                return self._start_phase2()
+            return False
+
+        for m in range(_N1):
+            face = _FACE[m]
+            if face == last_face or face + 3 == last_face:
+                continue
+            twist2 = t.twist_move[twist * _N1 + m]
+            flip2 = t.flip_move[flip * _N1 + m]
+            slice2 = t.slice_move[slice_ * _N1 + m]
+            if (t.twist_slice_prune[twist2 * _SLICE_SIZE + slice2] >= togo
+                    or t.flip_slice_prune[flip2 * _SLICE_SIZE + slice2] >= togo):
+                continue
+            self.moves.append(m)
+            if self._phase1(twist2, flip2, slice2, togo - 1, face):
+                return True
+            self.moves.pop()
+        return self._timed_out()
+
+    def _start_phase2(self):
+        state = self.cubies
+        for m in self.moves:
+            state = cubie.multiply(state, coord.MOVE_CUBIES[m])
+        corners = coord.CORNERS.get(state)
+        ud_edges = coord.UD_EDGES.get(state)
+        slice_edges = coord.SLICE_EDGES.get(state)
+
+        last_face = _FACE[self.moves[-1]] if self.moves else -1
+        for length in range(self.max_length - len(self.moves) + 1):
+            if self._phase2(corners, ud_edges, slice_edges, length, last_face):
+                self.solution = list(self.moves)
+                return True
+        return False
+
+    def _phase2(self, corners, ud_edges, slice_edges, togo, last_face):
+        t = self.t
+        if togo == 0:
+            return corners == ud_edges == slice_edges == 0
+
+        for k, m in enumerate(coord.PHASE2_MOVES):
+            face = _FACE[m]
+            if face == last_face or face + 3 == last_face:
+                continue
+            corners2 = t.corners_move[corners * _N2 + k]
+            ud_edges2 = t.ud_edges_move[ud_edges * _N2 + k]
+            slice_edges2 = t.slice_edges_move[slice_edges * _N2 + k]
+            if (t.corners_slice_prune[corners2 * _SLICE_EDGES_SIZE + slice_edges2] >= togo
+                    or t.ud_edges_slice_prune[ud_edges2 * _SLICE_EDGES_SIZE + slice_edges2] >= togo):
+                continue
+            self.moves.append(m)
+            if self._phase2(corners2, ud_edges2, slice_edges2, togo - 1, face):
+                return True
+            self.moves.pop()
+        return False
+
+
+def solve(c, max_length=24, timeout=None):
+    """Find a solution for the Cube c with the two-phase algorithm. The cube is not changed.
+
+    :param max_length: The maximum number of face turns (counting half turns as one) in the
+        solution. The search stops at the first solution that is no longer than this.
+    :param timeout: If given, the number of seconds after which to give up
+    :return: A list of moves like Solver.moves, with half turns written as two quarter turns,
+        or None if no solution was found within max_length moves and the timeout
+    :raises ValueError: If the cube can not be solved
+    """
+    cubies = validate.check(c)
+    deadline = None if timeout is None else time.monotonic() + timeout
+    solution = _Search(cubies, max_length, deadline).run()
+    if solution is None:
+        return None
+    return coord.move_names(solution)
+
+
+class NoSolutionError(RuntimeError):
+    """Raised when no solution was found within the maximum length and the timeout"""
+
+
+class TwoPhaseSolver:
+    """A drop-in alternative to rubik.solve.Solver that finds much shorter solutions"""
+
+    def __init__(self, c, max_length=24, timeout=None):
+        self.cube = c
+        self.max_length = max_length
+        self.timeout = timeout
+        self.moves = []
+
+    def solve(self):
+        """Solve the cube and record the solution in self.moves
+
+        :raises NoSolutionError: If no solution was found within max_length moves and the timeout
+        """
+        moves = solve(self.cube, self.max_length, self.timeout)
+        if moves is None:
+            raise NoSolutionError(f"No solution within {self.max_length} moves\n" + str(self.cube))
+        self.moves = moves
+        self.cube.sequence(" ".join(moves))
@@ -0,0 +1,146 @@
+"""Check that a cube can be solved before solving it.
+
+validate() returns a Reason, which is Reason.OK for a solvable cube or says what is wrong
+with it, in the order the checks are made:
+
+    WRONG_LENGTH      the cube string does not have 54 stickers
+    CENTERS           two centers have the same color
+    STICKER_COUNTS    some color is not on exactly nine stickers
+    INVALID_CORNER    a corner has colors that no corner has, e.g. two opposite colors
+    INVALID_EDGE      an edge has colors that no edge has
+    DUPLICATE_PIECE   some corner or edge appears twice
+    CORNER_TWIST      a corner is twisted in place
+    EDGE_FLIP         an edge is flipped in place
+    PARITY            two pieces are swapped
+
+A cube that passes every check can be solved. rubik.batch.CubeBatch.validate() makes the
+same checks for many cubes at once.
+"""
+import collections
+import enum
+
+from rubik import cubie
+from rubik.cube import Cube
+
+
+class Reason(enum.IntEnum):
+    OK = 0
+    WRONG_LENGTH = 1
+    CENTERS = 2
+    STICKER_COUNTS = 3
+    INVALID_CORNER = 4
+    INVALID_EDGE = 5
+    DUPLICATE_PIECE = 6
+    CORNER_TWIST = 7
+    EDGE_FLIP = 8
+    PARITY = 9
+
+
+MESSAGES = {
+    Reason.OK: "The cube can be solved",
+    Reason.WRONG_LENGTH: "Invalid cube: a cube has 54 stickers",
+    Reason.CENTERS: "Invalid cube: the centers must have six different colors",
+    Reason.STICKER_COUNTS: "Invalid cube: each color must be on nine stickers",
+    Reason.INVALID_CORNER: "Invalid cube: a corner has colors that no corner has",
+    Reason.INVALID_EDGE: "Invalid cube: an edge has colors that no edge has",
+    Reason.DUPLICATE_PIECE: "Invalid cube: each corner and edge must appear exactly once",
+    Reason.CORNER_TWIST: "Unsolvable cube: a corner is twisted",
+    Reason.EDGE_FLIP: "Unsolvable cube: an edge is flipped",
+    Reason.PARITY: "Unsolvable cube: two pieces are swapped",
+}
+
+
+class UnsolvableCubeError(ValueError):
+    """Raised for a cube that can not be solved. self.reason is the Reason."""
+
+    def __init__(self, reason):
+        super().__init__(MESSAGES[reason])
+        self.reason = reason
+
+
+def _piece_tables(piece_faces):
+    """
+    :return: The piece and the orientation of the piece for each key of the faces of a corner
+        (or edge) position, where the key of faces (a, b, c) is a * 36 + b * 6 + c, and -1 for
+        keys that are not a piece
+    """
+    n = len(piece_faces[0])
+    pieces, orientations = [-1] * 6 ** n, [-1] * 6 ** n
+    for piece, faces in enumerate(piece_faces):
+        for ori in range(n):
+            at = [None] * n
+            for i, face in enumerate(faces):
+                at[(i + ori) % n] = face
+            key = 0
+            for face in at:
+                key = key * 6 + face
+            pieces[key] = piece
+            orientations[key] = ori
+    return tuple(pieces), tuple(orientations)
+
+
+# The corner (or edge) and its twist (or flip) for each key of the faces of a position
+CORNER_PIECES, CORNER_TWISTS = _piece_tables(cubie.CORNER_FACES)
+EDGE_PIECES, EDGE_FLIPS = _piece_tables(cubie.EDGE_FACES)
+
+
+def _parity(perm):
+    return sum(1 for i in range(len(perm)) for j in range(i) if perm[j] > perm[i]) % 2
+
+
+def _reason_and_cubies(c):
+    colors = c.flat_str() if isinstance(c, Cube) else "".join(str(c).split())
+    if len(colors) != 54:
+        return Reason.WRONG_LENGTH, None
+    face_of = {colors[f]: face for face, f in enumerate(cubie.CENTER_FACELETS)}
+    if len(face_of) != 6:
+        return Reason.CENTERS, None
+    counts = collections.Counter(colors)
+    if len(counts) != 6 or any(n != 9 for n in counts.values()):
+        return Reason.STICKER_COUNTS, None
+    faces = [face_of[color] for color in colors]
+
+    cp, co = [], []
+    for f0, f1, f2 in cubie.CORNER_FACELETS:
+        key = (faces[f0] * 6 + faces[f1]) * 6 + faces[f2]
+        if CORNER_PIECES[key] < 0:
+            return Reason.INVALID_CORNER, None
+        cp.append(CORNER_PIECES[key])
+        co.append(CORNER_TWISTS[key])
+    ep, eo = [], []
+    for f0, f1 in cubie.EDGE_FACELETS:
+        key = faces[f0] * 6 + faces[f1]
+        if EDGE_PIECES[key] < 0:
+            return Reason.INVALID_EDGE, None
+        ep.append(EDGE_PIECES[key])
+        eo.append(EDGE_FLIPS[key])
+
+    if len(set(cp)) != 8 or len(set(ep)) != 12:
+        return Reason.DUPLICATE_PIECE, None
+    if sum(co) % 3:
+        return Reason.CORNER_TWIST, None
+    if sum(eo) % 2:
+        return Reason.EDGE_FLIP, None
+    if _parity(cp) != _parity(ep):
+        return Reason.PARITY, None
+    return Reason.OK, (tuple(cp), tuple(co), tuple(ep), tuple(eo))
+
+
+def validate(c):
+    """
+    :param c: A Cube, or a cube string (see Cube.__init__)
+    :return: Reason.OK if the cube can be solved, otherwise the Reason it can not be
+    """
+    return _reason_and_cubies(c)[0]
+
+
+def check(c):
+    """
+    :param c: A Cube, or a cube string (see Cube.__init__)
+    :return: The cubies (cp, co, ep, eo) of the cube (see rubik.cubie)
+    :raises UnsolvableCubeError: If the cube can not be solved
+    """
+    reason, cubies = _reason_and_cubies(c)
+    if reason != Reason.OK:
+        raise UnsolvableCubeError(reason)
+    return cubies
@@ -11,13 +11,19 @@ setup_params = dict(
     url="https://github.com/pglass/cube",
     keywords="rubik cube solver",
     packages=["rubik"],
-    package_data={"": ["LICENSE"]},
+    package_data={"": ["LICENSE"], "rubik": ["data/*.tbl"]},
     package_dir={"rubik": "rubik"},
     include_package_data=True,
     description="A basic, pure-Python Rubik's cube solver",
     long_description=long_description,
     long_description_content_type="text/markdown",
     install_requires=[],
+    extras_require={
+        "numpy": ["numpy"],
+    },
+    entry_points={
+        "console_scripts": ["rubik-tables = rubik.tables:main"],
+    },
     classifiers=[
         "Development Status :: 4 - Beta",
         "Environment :: Console",
@@ -1,9 +1,13 @@
 import random
+import sys
 import time
 from rubik import solve
 from rubik.cube import Cube
 from rubik.solve import Solver
+from rubik.twophase import TwoPhaseSolver
+from rubik.parallel import OrientationSolver
 from rubik.optimize import optimize_moves
+from rubik.instrument import StageReport
 
 SOLVED_CUBE_STR = "OOOOOOOOOYYYWWWGGGBBBYYYWWWGGGBBBYYYWWWGGGBBBRRRRRRRRR"
 MOVES = ["L", "R", "U", "D", "F", "B", "M", "E", "S"]
@@ -19,7 +23,7 @@ def random_cube():
     return a
 
 
-def run():
+def run(solver_class=Solver, report=None):
     successes = 0
     failures = 0
 
@@ -28,7 +32,7 @@ def run():
     avg_time = 0.0
     while True:
         C = random_cube()
-        solver = Solver(C)
+        solver = solver_class(C) if report is None else solver_class(C, on_stage=report)
 
         start = time.time()
         solver.solve()
@@ -50,8 +54,17 @@ def run():
             print(f"{total}: {successes} successes ({pass_percentage:0.3f}% passing)"
                   f" avg_moves={avg_moves:0.3f} avg_opt_moves={avg_opt_moves:0.3f}"
                   f" avg_time={avg_time:0.3f}s")
+            if report is not None:
+                print(report)
 
 
 if __name__ == '__main__':
     solve.DEBUG = False
-    run()
+    if "--two-phase" in sys.argv[1:]:
+        run(TwoPhaseSolver)
+    elif "--orientations" in sys.argv[1:]:
+        run(OrientationSolver)
+    elif "--profile" in sys.argv[1:]:
+        run(Solver, StageReport())
+    else:
+        run(Solver)
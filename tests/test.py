@@ -1,14 +1,58 @@
+import concurrent.futures
+import contextlib
+import io
+import random
 import string
 import unittest
 import itertools
+import os
+import tempfile
 import traceback
+from array import array
+from unittest import mock
 
 import rubik.cube as cube
 from rubik.cube import Cube
 from rubik.maths import Point, Matrix
-from rubik.solve import Solver
+from rubik.solve import Solver, ORIENTATIONS
 from rubik.optimize import optimize_moves
+from rubik.twophase import NoSolutionError, TwoPhaseSolver
+from rubik.optimal import OptimalSolver
+from rubik.bidirectional import BidirectionalSolver
+import rubik.anytime
+import rubik.parallel
+from rubik.parallel import OrientationSolver
+import rubik.optimal
 import rubik.optimize
+import rubik.solve
+from rubik.instrument import StageReport
+import rubik.validate
+from rubik.validate import Reason, UnsolvableCubeError, validate
+import rubik.cubie
+from rubik import coord
+from rubik import encoding
+import rubik.tables
+
+try:
+    import numpy
+
+    from rubik.batch import CubeBatch
+except ImportError:
+    numpy = None
+
+
+def setUpModule():
+    # build the solver tables in an empty directory, not in the home directory
+    global _table_dir, _table_env
+    _table_dir = tempfile.TemporaryDirectory()
+    _table_env = mock.patch.dict(os.environ, {"RUBIK_TABLE_DIR": _table_dir.name})
+    _table_env.start()
+
+
+def tearDownModule():
+    _table_env.stop()
+    _table_dir.cleanup()
+
 
 solved_cube_str = \
 """    UUU
@@ -612,6 +656,120 @@ class TestCube(unittest.TestCase):
         self.assertEqual(cube.FACE, piece.type)
         self.assertEqual(cube.FRONT, piece.pos)
 
+    def test_cube_piece_follows_moves(self):
+        piece = self.debug_cube.find_piece('d', '7')
+        self.debug_cube.F()
+        self.assertEqual(cube.FRONT + cube.RIGHT, piece.pos)
+        self.assertEqual(['7', None, 'd'], piece.colors)
+        self.assertIs(piece, self.debug_cube[1, 0, 1])
+
+    def test_cube_piece_pos_and_colors_are_copies(self):
+        pos = self.debug_cube[cube.RIGHT].pos
+        pos += cube.UP
+        self.assertEqual(Point(1, 0, 0), cube.RIGHT)
+        self.assertEqual(cube.RIGHT, self.debug_cube[cube.RIGHT].pos)
+        colors = self.debug_cube[1, 1, 1].colors
+        expected = list(colors)
+        colors[0] = 'Z'
+        self.assertEqual(expected, self.debug_cube[1, 1, 1].colors)
+        self.assertEqual(cube.FACE, Cube(debug_cube_str)[1, 0, 0].type)
+
+    def test_cube_piece_lookups_follow_restore(self):
+        c = self.debug_cube
+        piece = c.find_piece('d', '7')
+        pos, colors = piece.pos, piece.colors
+        snapshot = c.snapshot()
+        c.sequence("R U F")
+        d = Cube(c)
+        c.restore(snapshot)
+        self.assertEqual(pos, piece.pos)
+        self.assertEqual(colors, piece.colors)
+        d.sequence("Fi Ui Ri F")
+        self.assertEqual(cube.FRONT + cube.RIGHT, d.find_piece('d', '7').pos)
+        self.assertEqual(['7', None, 'd'], d.find_piece('d', '7').colors)
+
+    def test_cube_find_piece_after_moves(self):
+        self.debug_cube.sequence("R U Ri X M")
+        for piece in self.debug_cube.pieces:
+            colors = [c for c in piece.colors if c is not None]
+            self.assertIs(piece, self.debug_cube.find_piece(*colors))
+            self.assertIs(piece, self.debug_cube.get_piece(*piece.pos))
+
+    def test_cube_get_piece_negative(self):
+        self.assertIsNone(self.debug_cube.get_piece(0, 0, 0))
+        self.assertIsNone(self.debug_cube.get_piece(2, 0, 0))
+
+    def test_cube_face_colors(self):
+        self.debug_cube.X()
+        self.assertEqual('m', self.debug_cube.left_color())
+        self.assertEqual('s', self.debug_cube.right_color())
+        self.assertEqual('p', self.debug_cube.up_color())
+        self.assertEqual('v', self.debug_cube.down_color())
+        self.assertEqual('N', self.debug_cube.front_color())
+        self.assertEqual('4', self.debug_cube.back_color())
+
+    def test_cube_copy_is_independent(self):
+        c = Cube(self.debug_cube)
+        c.L()
+        self.assertEqual(debug_cube_str, str(self.debug_cube))
+        self.assertNotEqual(debug_cube_str, str(c))
+
+    def test_cube_snapshot_restore(self):
+        snapshot = self.debug_cube.snapshot()
+        self.debug_cube.sequence("R U Ri X M")
+        self.assertNotEqual(debug_cube_str, str(self.debug_cube))
+        self.debug_cube.restore(snapshot)
+        self.assertEqual(debug_cube_str, str(self.debug_cube))
+
+    def test_cube_push_pop_move(self):
+        moves = ["R", "U", "Ri", "X", "M", "Si", "Bi"]
+        for name in moves:
+            self.debug_cube.push_move(name)
+        expected = Cube(debug_cube_str)
+        expected.sequence(" ".join(moves))
+        self.assertEqual(str(expected), str(self.debug_cube))
+
+        for name in reversed(moves):
+            self.assertEqual(name, self.debug_cube.pop_move())
+        self.assertEqual(debug_cube_str, str(self.debug_cube))
+        self.assertRaises(IndexError, self.debug_cube.pop_move)
+
+    def test_cube_state_key(self):
+        c = Cube(debug_cube_str)
+        c.state_key()
+        c.sequence("R U Ri X M")
+        d = Cube(debug_cube_str)
+        d.sequence("R U Ri X M")
+        self.assertEqual(d.state_key(), c.state_key())
+        self.assertNotEqual(self.debug_cube.state_key(), c.state_key())
+
+        for name in reversed(["R", "U", "Ri", "X", "M"]):
+            getattr(c, name + 'i' if len(name) == 1 else name[0])()
+        self.assertEqual(self.debug_cube.state_key(), c.state_key())
+
+    def test_cube_state_key_is_stable(self):
+        self.assertEqual(0x203e5d0cbe30a2df,
+                         Cube("OOOOOOOOOYYYWWWGGGBBBYYYWWWGGGBBBYYYWWWGGGBBBRRRRRRRRR").state_key())
+
+    def test_cube_state_key_follows_stack_and_snapshots(self):
+        c = Cube(self.solved_cube)
+        key = c.state_key()
+        snapshot = c.snapshot()
+        for name in ("R", "U", "F"):
+            c.push_move(name)
+        self.assertNotEqual(key, c.state_key())
+        c.restore(snapshot)
+        self.assertEqual(key, c.state_key())
+        c.push_move("B")
+        c.pop_move()
+        self.assertEqual(key, c.state_key())
+
+    def test_cube_hash(self):
+        c = Cube(self.solved_cube)
+        c.sequence("X X X X")
+        self.assertEqual({self.solved_cube, self.debug_cube}, {c, self.debug_cube})
+        self.assertEqual(hash(self.solved_cube), hash(c))
+
     def test_move_and_inverse(self):
         for name in ('R', 'L', 'U', 'D', 'F', 'B', 'M', 'E', 'S', 'X', 'Y', 'Z'):
             move, unmove = getattr(Cube, name), getattr(Cube, name + 'i')
@@ -629,6 +787,257 @@ class TestCube(unittest.TestCase):
         self.assertEqual(check_str, str(cube))
 
 
+class TestMoveTables(unittest.TestCase):
+
+    def test_move_tables_are_permutations(self):
+        self.assertEqual(set(cube.MOVE_NAMES), set(cube.MOVE_TABLES))
+        for perm in cube.MOVE_TABLES.values():
+            self.assertEqual(list(range(54)), sorted(perm))
+
+    def test_move_tables_match_cube_moves(self):
+        flat = "".join(x for x in debug_cube_str if x not in string.whitespace)
+        for name in cube.MOVE_NAMES:
+            c = Cube(debug_cube_str)
+            getattr(c, name)()
+            self.assertEqual(c.flat_str(), "".join(cube.apply_permutation(flat, cube.MOVE_TABLES[name])))
+
+    def test_compose_permutations(self):
+        c = Cube(debug_cube_str)
+        c.sequence("R U Fi M")
+        perm = cube.compose_permutations(*(cube.MOVE_TABLES[name] for name in ("R", "U", "Fi", "M")))
+        flat = "".join(x for x in debug_cube_str if x not in string.whitespace)
+        self.assertEqual(c.flat_str(), "".join(cube.apply_permutation(flat, perm)))
+
+    def test_invert_permutation(self):
+        for name in ('R', 'L', 'U', 'D', 'F', 'B', 'M', 'E', 'S', 'X', 'Y', 'Z'):
+            self.assertEqual(cube.MOVE_TABLES[name + 'i'], cube.invert_permutation(cube.MOVE_TABLES[name]))
+
+    def test_half_turns(self):
+        for name in ('R', 'L', 'U', 'D', 'F', 'B', 'M', 'E', 'S', 'X', 'Y', 'Z'):
+            perm = cube.MOVE_TABLES[name]
+            self.assertEqual(cube.compose_permutations(perm, perm), cube.MOVE_TABLES[name + '2'])
+
+
+class TestAlgorithm(unittest.TestCase):
+
+    def test_algorithm_matches_moves(self):
+        moves = "L U M Ri X E Xi Ri D D F F Bi"
+        algorithm = cube.Algorithm(moves)
+        c = Cube(debug_cube_str)
+        c.sequence(algorithm)
+        d = Cube(debug_cube_str)
+        for name in moves.split():
+            getattr(d, name)()
+        self.assertEqual(d, c)
+        self.assertEqual(tuple(moves.split()), algorithm.moves)
+        self.assertEqual(13, len(algorithm))
+        self.assertEqual(moves, str(algorithm))
+        self.assertEqual(algorithm, eval(repr(algorithm), {"Algorithm": cube.Algorithm}))
+
+    def test_algorithm_add(self):
+        self.assertEqual(cube.Algorithm("R U Ri Ui"), cube.Algorithm("R U") + "Ri Ui")
+        self.assertEqual(cube.Algorithm("R U Ri Ui"), "R" + cube.Algorithm("U Ri") + cube.Algorithm("Ui"))
+        c = Cube(debug_cube_str)
+        c.sequence(cube.Algorithm("R U") + "Ri Ui")
+        d = Cube(debug_cube_str)
+        d.sequence("R U Ri Ui")
+        self.assertEqual(d, c)
+
+    def test_algorithm_updates_state_key(self):
+        c = Cube(debug_cube_str)
+        c.state_key()
+        c.sequence(cube.Algorithm("R U Ri X M"))
+        self.assertEqual(Cube(c).state_key(), c.state_key())
+
+    def test_empty_algorithm(self):
+        c = Cube(debug_cube_str)
+        c.sequence(cube.Algorithm(""))
+        c.sequence("")
+        self.assertEqual(Cube(debug_cube_str), c)
+
+    def test_unknown_move(self):
+        self.assertRaises(ValueError, cube.Algorithm, "R Q")
+        self.assertRaises(ValueError, Cube(debug_cube_str).sequence, "R Q")
+
+    def test_standard_notation(self):
+        self.assertEqual(("Ri", "U2", "F", "M2", "Xi"), cube.Algorithm("R' U2 F M2' X'").moves)
+        c, d = Cube(debug_cube_str), Cube(debug_cube_str)
+        c.sequence("R' U2 F B2 Li")
+        d.sequence("Ri U U F B B Li")
+        self.assertEqual(d, c)
+        self.assertEqual(["R'", "U2", "F", "L'"], cube.standard_notation(["Ri", "U2", "F", "Li"]))
+
+        c.push_move("B2")
+        c.push_move("F'")
+        self.assertEqual("Fi", c.pop_move())
+        self.assertEqual("B2", c.pop_move())
+        self.assertEqual(d, c)
+        self.assertRaises(ValueError, c.push_move, "Q")
+        self.assertEqual(d, c)
+
+    def test_solver_move_records_algorithm_moves(self):
+        c = Cube(solved_cube_str)
+        solver = Solver(c)
+        solver.move(cube.Algorithm("R U Ri"))
+        solver.move("Ui")
+        self.assertEqual(["R", "U", "Ri", "Ui"], solver.moves)
+        check = Cube(solved_cube_str)
+        check.sequence("R U Ri Ui")
+        self.assertEqual(check, c)
+
+
+class TestEncoding(unittest.TestCase):
+
+    def test_cube_bytes_round_trip(self):
+        for s in TestSolver.cubes + [solved_cube_str]:
+            c = Cube(s)
+            c.sequence("M X")
+            data = c.to_bytes()
+            self.assertEqual(encoding.RECORD_SIZE, len(data))
+            self.assertEqual(c, Cube.from_bytes(data))
+
+    def test_encode_many(self):
+        data = encoding.encode_many(TestSolver.cubes)
+        self.assertEqual(len(TestSolver.cubes) * encoding.RECORD_SIZE, len(data))
+        self.assertEqual(TestSolver.cubes, encoding.decode_many(data))
+
+    def test_cubies_rank_round_trip(self):
+        c = Cube(solved_cube_str)
+        for name in ("R", "U", "F", "L", "D", "B"):
+            c.sequence(name)
+            cubies = rubik.cubie.from_facelets(c.flat_str())[1]
+            self.assertEqual(cubies, encoding.cubies_unrank(encoding.cubies_rank(cubies)))
+        self.assertEqual(0, encoding.cubies_rank(rubik.cubie.SOLVED))
+
+    def test_encode_invalid_cube(self):
+        self.assertRaises(ValueError, encoding.encode, "".join(debug_cube_str.split()))
+        self.assertRaises(ValueError, encoding.encode, "".join(TestSolver.unsolvable_cubes[1].split()))
+        self.assertRaises(ValueError, encoding.decode, b"UUU")
+
+
+class TestCoordinates(unittest.TestCase):
+
+    def test_solved_coordinates(self):
+        self.assertEqual((0, 0, 0, 0, 0), tuple(coord.coordinates(Cube(solved_cube_str))))
+
+    def test_coordinates_round_trip(self):
+        for s in TestSolver.cubes:
+            c = Cube(s)
+            coords = coord.coordinates(c)
+            centers = [c.up_color(), c.left_color(), c.front_color(),
+                       c.right_color(), c.back_color(), c.down_color()]
+            self.assertEqual(c, coord.to_cube(coords.twist, coords.flip, coords.corners, coords.edges, centers))
+
+    def test_coordinate_set_get(self):
+        for coordinate in (coord.TWIST, coord.FLIP, coord.SLICE, coord.SLICE_EDGES):
+            for i in range(coordinate.size):
+                self.assertEqual(i, coordinate.get(coordinate.set(i)))
+
+    def test_subset_coordinate_set_get(self):
+        for coordinate in (coord.U_CORNER_SUBSET, coord.SLICE_EDGE_SUBSET):
+            self.assertEqual(0, coordinate.get(rubik.cubie.SOLVED))
+            for i in range(0, coordinate.size, 97):
+                self.assertEqual(i, coordinate.get(coordinate.set(i)))
+
+    def test_move_tables(self):
+        coordinates = (coord.TWIST, coord.FLIP, coord.SLICE, coord.U_CORNER_SUBSET, coord.SLICE_EDGE_SUBSET)
+        tables = {coordinate: coordinate.move_table() for coordinate in coordinates}
+        c = Cube(solved_cube_str)
+        for move in ("R", "U", "Fi", "D2", "L", "B", "R2", "Ui", "F2"):
+            before = rubik.cubie.from_facelets(c.flat_str())[1]
+            c.sequence(move)
+            after = rubik.cubie.from_facelets(c.flat_str())[1]
+            m = coord.MOVES.index(move)
+            for coordinate, table in tables.items():
+                self.assertEqual(coordinate.get(after), table[coordinate.get(before) * len(coord.MOVES) + m])
+
+    def test_phase2_moves(self):
+        table = coord.SLICE_EDGES.move_table(coord.PHASE2_MOVES)
+        self.assertEqual(24 * 10, len(table))
+        c = Cube(solved_cube_str)
+        c.sequence("R2")
+        cubies = rubik.cubie.from_facelets(c.flat_str())[1]
+        self.assertEqual(coord.SLICE_EDGES.get(cubies), table[coord.PHASE2_MOVES.index(coord.MOVES.index("R2"))])
+
+    def test_move_names(self):
+        self.assertEqual(18, len(set(coord.MOVES) & set(cube.MOVE_NAMES)))
+        self.assertEqual(["R", "R", "Ui", "F"], coord.move_names([coord.MOVES.index(m) for m in ("R2", "Ui", "F")]))
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class TestCubeBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.strs = [Cube(c).flat_str() for c in TestSolver.cubes]
+        self.batch = CubeBatch.from_strings(self.strs)
+
+    def test_batch_round_trip(self):
+        self.assertEqual(self.strs, self.batch.flat_strs())
+        self.assertEqual([str(Cube(c)) for c in self.strs], self.batch.strs())
+        self.assertEqual([Cube(c) for c in self.strs], self.batch.to_cubes())
+        self.assertEqual(Cube(self.strs[2]), self.batch[2])
+        self.assertEqual(self.strs[1:3], self.batch[1:3].flat_strs())
+
+    def test_batch_apply(self):
+        for name in cube.MOVE_NAMES:
+            batch = self.batch.copy()
+            batch.apply(name)
+            for s, actual in zip(self.strs, batch.flat_strs()):
+                c = Cube(s)
+                getattr(c, name)()
+                self.assertEqual(c.flat_str(), actual)
+
+    def test_batch_sequence(self):
+        moves = "L U M Ri X E Xi Ri D D F F Bi"
+        self.batch.sequence(moves)
+        for s, actual in zip(self.strs, self.batch.to_cubes()):
+            c = Cube(s)
+            c.sequence(moves)
+            self.assertEqual(c, actual)
+
+    def test_batch_sequence_algorithm(self):
+        algorithm = cube.Algorithm("R U Ri Ui")
+        self.batch.sequence(algorithm)
+        for s, actual in zip(self.strs, self.batch.to_cubes()):
+            c = Cube(s)
+            c.sequence(algorithm)
+            self.assertEqual(c, actual)
+
+    def test_batch_apply_each(self):
+        names = ["R", "Ui", "M", "Z", "Bi"]
+        self.batch.apply_each(names)
+        for s, name, actual in zip(self.strs, names, self.batch.to_cubes()):
+            c = Cube(s)
+            getattr(c, name)()
+            self.assertEqual(c, actual)
+        self.assertRaises(ValueError, self.batch.apply_each, ["R"])
+
+        batch = CubeBatch.from_strings(self.strs)
+        batch.apply_each(numpy.array([cube.MOVE_NAMES.index(name) for name in names]))
+        self.assertTrue(batch.equals(self.batch).all())
+
+    def test_batch_is_solved(self):
+        batch = CubeBatch.repeat(Cube(solved_cube_str), 3)
+        batch.apply_each(["R", "X", "M"])
+        self.assertEqual([False, True, False], list(batch.is_solved()))
+        self.assertFalse(self.batch.is_solved().any())
+
+    def test_batch_equals(self):
+        self.assertTrue(self.batch.equals(self.batch.copy()).all())
+        self.assertEqual([False, False, True, False, False], list(self.batch.equals(Cube(self.strs[2]))))
+
+    def test_batch_requires_54_stickers(self):
+        self.assertRaises(ValueError, CubeBatch.from_strings, ["UUU"])
+        self.assertRaises(ValueError, CubeBatch, numpy.zeros((2, 53)))
+
+    def test_batch_validate(self):
+        # a batch can only hold cubes with 54 stickers
+        strs = self.strs + TestSolver.unsolvable_cubes + [s for s in TestValidate.invalid_cubes if len(s) == 54]
+        reasons = CubeBatch.from_strings(strs).validate()
+        self.assertEqual([validate(s) for s in strs], list(reasons))
+        self.assertEqual([Reason.OK] * len(self.strs), list(reasons[:len(self.strs)]))
+
+
 class TestSolver(unittest.TestCase):
 
     cubes = [
@@ -660,6 +1069,101 @@ class TestSolver(unittest.TestCase):
         except Exception:
             self.fail(traceback.format_exc() + "original cube: " + orig)
 
+    def test_solver_moves_have_no_rotations(self):
+        for orig in self.cubes:
+            c = Cube(orig)
+            solver = Solver(c)
+            solver.solve()
+            self.assertFalse({"X", "Xi", "Y", "Yi", "Z", "Zi"} & set(solver.moves))
+            self.assertEqual(c, solver.cube)
+            check = Cube(orig)
+            check.sequence(" ".join(solver.moves))
+            self.assertEqual(c, check)
+
+    def test_solver_move_relabels_rotations(self):
+        c = Cube(solved_cube_str)
+        solver = Solver(c)
+        solver.move("X U Xi Z R")
+        self.assertEqual(["F", "U"], solver.moves)
+        check = Cube(solved_cube_str)
+        check.sequence("F U")
+        self.assertEqual(check, c)
+
+    def test_solver_move_relabels_half_turns(self):
+        c = Cube(solved_cube_str)
+        solver = Solver(c)
+        solver.move("X2 U2 R' Z2 R2")
+        self.assertEqual(["D2", "Ri", "L2"], solver.moves)
+        check = Cube(solved_cube_str)
+        check.sequence("D2 Ri L2")
+        self.assertEqual(check, c)
+
+    def test_last_layer(self):
+        rng = random.Random(17)
+        for _ in range(20):
+            c = Cube(solved_cube_str)
+            # scramble the BACK layer only
+            algorithms = rng.choices(rubik.solve._LL_ALGORITHMS, k=6)
+            c.sequence("X X " + " ".join(" ".join(a.moves) for a in algorithms) + " Xi Xi")
+            solver = Solver(c)
+            solver.last_layer()
+            self.assertTrue(c.is_solved())
+            # the longest case takes 41 moves
+            self.assertLessEqual(len(solver.moves), 41)
+
+    def test_solver_on_stage(self):
+        stats = []
+        c = Cube(self.cubes[0])
+        solver = Solver(c, on_stage=stats.append)
+        solver.solve()
+        self.assertTrue(c.is_solved())
+        self.assertEqual(list(rubik.solve.STAGES), [s.stage for s in stats])
+        self.assertEqual(len(solver.moves), sum(s.moves for s in stats))
+        self.assertTrue(all(s.seconds >= 0 and s.permutations > 0 and s.lookups > 0 for s in stats))
+
+        # the same solution as without measuring
+        plain = Solver(Cube(self.cubes[0]))
+        plain.solve()
+        self.assertEqual(plain.moves, solver.moves)
+
+    def test_solver_skips_satisfied_stages(self):
+        solver = Solver(Cube(solved_cube_str))
+        self.assertIsNone(solver.first_unsatisfied_stage())
+        solver.solve()
+        self.assertEqual([], solver.moves)
+
+        for move_str, first in (("B", "last_layer"), ("B R B Ri", "cross_corners"), ("R", "cross")):
+            c = Cube(solved_cube_str)
+            c.sequence(move_str)
+            stats = []
+            solver = Solver(c, on_stage=stats.append)
+            self.assertEqual(first, solver.first_unsatisfied_stage())
+            earlier = rubik.solve.STAGES[:rubik.solve.STAGES.index(first)]
+            self.assertTrue(all(solver.satisfied(stage) for stage in earlier))
+            solver.solve()
+            self.assertTrue(c.is_solved())
+            self.assertEqual(first, stats[0].stage)
+
+        # the pieces already in place are not moved out and back
+        c = Cube(solved_cube_str)
+        c.sequence("B")
+        solver = Solver(c)
+        solver.solve()
+        self.assertEqual(["Bi"], solver.moves)
+
+    def test_stage_report(self):
+        report = StageReport()
+        other = StageReport()
+        for orig in self.cubes:
+            Solver(Cube(orig), on_stage=report).solve()
+            Solver(Cube(orig), on_stage=other).solve()
+        report.merge(other)
+        self.assertEqual(list(rubik.solve.STAGES), list(report.totals))
+        self.assertEqual({2 * len(self.cubes)}, set(report.counts.values()))
+        averages = report.averages()
+        self.assertEqual(report.totals["cross"].moves / report.counts["cross"], averages[0].moves)
+        self.assertIn("second_layer", str(report))
+
     def test_unsolvable_cube(self):
         for c in self.unsolvable_cubes:
             self._check_cube_fails_to_solve(c)
@@ -667,7 +1171,339 @@ class TestSolver(unittest.TestCase):
     def _check_cube_fails_to_solve(self, orig):
         c = Cube(orig)
         solver = Solver(c)
-        self.assertRaisesRegex(Exception, "Stuck in loop - unsolvable cube", solver.solve)
+        # the cube is checked before the solver starts
+        self.assertRaises(UnsolvableCubeError, solver.solve)
+        self.assertEqual([], solver.moves)
+        self.assertEqual(Cube(orig), c)
+
+
+class TestValidate(unittest.TestCase):
+
+    # flat cube strings, each with the only reason it can not be solved
+    invalid_cubes = (
+        "OOOOOOOOOYYYWWWGGGBBBYYYWOWGGGBBBYYYWWWGGGBBBRRRRRRRRR",  # two orange centers
+        "OOOOOOOOOYYYWWWGGGBBBYYYWWWGGGBBBYYYWWWGGGBBBRRRRRRRRO",  # ten orange stickers
+        "OOOOOOOOOYYYWWWGGGBBBYYYWWWGGGBBBYYYWWWGGGBBBRRRRRRRRX",  # a sticker of no color
+        "OOOOOOOOOYYYWWWGGGBBBYYYWWWGGGBBBYYYWRWGGGBBBRWRRRRRRR",  # an edge with two colors swapped
+        "OOOOOOOOOYYYWWWGGGBBBYYYWWWGGGBBBYYYWWWGGGBBBRRRRRRRRR"[:53],
+    )
+    reasons = (Reason.CENTERS, Reason.STICKER_COUNTS, Reason.STICKER_COUNTS, Reason.EDGE_FLIP,
+               Reason.WRONG_LENGTH)
+
+    def test_validate(self):
+        for orig in TestSolver.cubes:
+            self.assertEqual(Reason.OK, validate(orig))
+            self.assertEqual(Reason.OK, validate(Cube(orig)))
+        for orig, reason in zip(self.invalid_cubes, self.reasons):
+            self.assertEqual(reason, validate(orig), msg=orig)
+
+    def test_validate_unsolvable(self):
+        self.assertEqual([Reason.CORNER_TWIST, Reason.INVALID_CORNER, Reason.INVALID_CORNER,
+                          Reason.INVALID_CORNER, Reason.EDGE_FLIP],
+                         [validate(c) for c in TestSolver.unsolvable_cubes])
+
+        c = Cube(solved_cube_str)
+        c.sequence("R U Ri Ui")
+        # swap two edges
+        colors = list(c.flat_str())
+        for a, b in ((7, 5), (13, 16)):
+            colors[a], colors[b] = colors[b], colors[a]
+        self.assertEqual(Reason.PARITY, validate("".join(colors)))
+
+    def test_check(self):
+        self.assertEqual(rubik.cubie.from_facelets(TestSolver.cubes[0])[1], rubik.validate.check(TestSolver.cubes[0]))
+        with self.assertRaises(UnsolvableCubeError) as cm:
+            rubik.validate.check(TestSolver.unsolvable_cubes[0])
+        self.assertEqual(Reason.CORNER_TWIST, cm.exception.reason)
+        self.assertIsInstance(cm.exception, ValueError)
+
+    def test_cube_string_length(self):
+        self.assertRaises(ValueError, Cube, solved_cube_str[:53])
+
+
+class TestOrientationSolver(unittest.TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        rubik.parallel.shutdown()
+
+    def test_solver_orientations(self):
+        for orientation in range(ORIENTATIONS):
+            c = Cube(TestSolver.cubes[0])
+            solver = Solver(c, orientation)
+            solver.solve()
+            self.assertTrue(c.is_solved())
+            self.assertEqual(c, solver.cube)
+
+    def test_orientation_solver(self):
+        lengths = []
+        for orientation in range(ORIENTATIONS):
+            solver = Solver(Cube(TestSolver.cubes[0]), orientation)
+            solver.solve()
+            lengths.append(len(optimize_moves(solver.moves)))
+
+        c = Cube(TestSolver.cubes[0])
+        solver = OrientationSolver(c)
+        solver.solve()
+        self.assertTrue(c.is_solved())
+        self.assertEqual(min(lengths), len(solver.moves))
+        self.assertEqual(min(lengths), lengths[solver.orientation])
+        # the pool is kept for the next call
+        self.assertIs(rubik.parallel.get_pool(), rubik.parallel.get_pool())
+
+    def test_orientation_solver_with_pool(self):
+        c = Cube(TestSolver.cubes[1])
+        with concurrent.futures.ThreadPoolExecutor(2) as pool:
+            moves, orientation = rubik.parallel.solve(c, orientations=[0, 5], pool=pool)
+        self.assertIn(orientation, [0, 5])
+        self.assertEqual(Cube(TestSolver.cubes[1]), c)
+        c.sequence(" ".join(moves))
+        self.assertTrue(c.is_solved())
+
+
+class TestTwoPhaseSolver(unittest.TestCase):
+
+    def test_two_phase_solver(self):
+        for orig in TestSolver.cubes:
+            c = Cube(orig)
+            solver = TwoPhaseSolver(c)
+            solver.solve()
+            self.assertTrue(c.is_solved(), msg="Failed to solve cube: " + orig)
+
+            check = Cube(orig)
+            check.sequence(" ".join(solver.moves))
+            self.assertTrue(check.is_solved())
+            self.assertEqual(solver.moves, optimize_moves(solver.moves))
+            # a half turn is written as two quarter turns, so allow for 24 of them
+            self.assertLessEqual(len(solver.moves), 48)
+
+    def test_two_phase_solved_cube(self):
+        solver = TwoPhaseSolver(Cube(solved_cube_str))
+        solver.solve()
+        self.assertEqual([], solver.moves)
+
+    def test_two_phase_unsolvable_cube(self):
+        for orig in TestSolver.unsolvable_cubes:
+            self.assertRaises(ValueError, TwoPhaseSolver(Cube(orig)).solve)
+
+    def test_two_phase_no_solution(self):
+        c = Cube(solved_cube_str)
+        c.sequence("F Ri U L Di B")
+        scrambled = Cube(c)
+        self.assertRaises(NoSolutionError, TwoPhaseSolver(c, max_length=3).solve)
+        self.assertEqual(scrambled, c)
+
+
+class TestOptimalSolver(unittest.TestCase):
+
+    def test_optimal_solver(self):
+        # the number of face turns, counting half turns as one, of the shortest solutions
+        for move_str, length in (("R", 1), ("R R", 1), ("R U Ri Ui", 4), ("F Ri U U L Di B B", 6),
+                                 ("U D", 2), ("R Ri U", 1)):
+            c = Cube(solved_cube_str)
+            c.sequence(move_str)
+            solver = OptimalSolver(c)
+            solver.solve()
+            self.assertTrue(c.is_solved())
+            # half turns are written as two quarter turns
+            self.assertEqual(length, len(list(itertools.groupby(solver.moves))))
+            self.assertGreater(solver.nodes, 0)
+            self.assertGreaterEqual(solver.nodes_per_second, 0)
+
+    def test_optimal_solved_cube(self):
+        solver = OptimalSolver(Cube(solved_cube_str))
+        solver.solve()
+        self.assertEqual([], solver.moves)
+
+    def test_optimal_max_length(self):
+        c = Cube(solved_cube_str)
+        c.sequence("F Ri U L Di B")
+        self.assertIsNone(rubik.optimal.solve(c, max_length=5))
+        self.assertEqual(6, len(rubik.optimal.solve(c, max_length=6)))
+        self.assertRaisesRegex(NoSolutionError, "^No solution within 5 moves", OptimalSolver(c, max_length=5).solve)
+
+    def test_optimal_unsolvable_cube(self):
+        for orig in TestSolver.unsolvable_cubes:
+            self.assertRaises(ValueError, OptimalSolver(Cube(orig)).solve)
+
+
+class TestBidirectionalSolver(unittest.TestCase):
+
+    def test_bidirectional_solver(self):
+        for move_str, length in (("", 0), ("R", 1), ("R R", 1), ("R U Ri Ui", 4), ("F Ri U U L Di B B", 6),
+                                 ("U D", 2), ("R Ri U", 1), ("R U F L D B R", 7)):
+            c = Cube(solved_cube_str)
+            c.sequence(move_str)
+            solver = BidirectionalSolver(c)
+            solver.solve()
+            self.assertTrue(c.is_solved())
+            self.assertFalse(solver.used_fallback)
+            # half turns are written as two quarter turns
+            self.assertEqual(length, len(list(itertools.groupby(solver.moves))))
+
+    def test_bidirectional_fallback(self):
+        c = Cube(solved_cube_str)
+        c.sequence("R U F L D B")
+        solver = BidirectionalSolver(c, max_depth=5, fallback=TwoPhaseSolver)
+        solver.solve()
+        self.assertTrue(c.is_solved())
+        self.assertTrue(solver.used_fallback)
+
+        c = Cube(TestSolver.cubes[0])
+        solver = BidirectionalSolver(c, max_states=1000)
+        solver.solve()
+        self.assertTrue(c.is_solved())
+        self.assertTrue(solver.used_fallback)
+
+    def test_bidirectional_unsolvable_cube(self):
+        for orig in TestSolver.unsolvable_cubes:
+            self.assertRaises(ValueError, BidirectionalSolver(Cube(orig)).solve)
+
+
+class TestAnytime(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # build the tables in an empty directory, as on a fresh machine, before any timed call
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.env = mock.patch.dict(os.environ, {"RUBIK_TABLE_DIR": cls.tmp.name})
+        cls.env.start()
+        rubik.anytime._load_tables()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.env.stop()
+        cls.tmp.cleanup()
+
+    def test_anytime_proves_optimal(self):
+        for move_str, length in (("", 0), ("R", 1), ("R U Ri Ui", 4), ("F Ri U U L Di B B", 6)):
+            c = Cube(solved_cube_str)
+            c.sequence(move_str)
+            result = rubik.anytime.solve(c, timeout=30)
+            self.assertTrue(result.optimal)
+            self.assertEqual(length, result.length)
+            self.assertLess(result.budget_used, 1.0)
+            c.sequence(" ".join(result.moves))
+            self.assertTrue(c.is_solved())
+
+    def test_anytime_past_deadline(self):
+        c = Cube(TestSolver.cubes[0])
+        result = rubik.anytime.solve(c, deadline=0.0)
+        self.assertEqual("solver", result.method)
+        self.assertFalse(result.optimal)
+        self.assertEqual(1.0, result.budget_used)
+        self.assertEqual(Cube(TestSolver.cubes[0]), c)
+        c.sequence(" ".join(result.moves))
+        self.assertTrue(c.is_solved())
+
+    def test_anytime_improves(self):
+        c = Cube(TestSolver.cubes[0])
+        result = rubik.anytime.solve(c, timeout=0.5)
+        self.assertEqual("two-phase", result.method)
+        self.assertLessEqual(result.length, 24)
+        c.sequence(" ".join(result.moves))
+        self.assertTrue(c.is_solved())
+
+    def test_anytime_needs_deadline(self):
+        self.assertRaises(TypeError, rubik.anytime.solve, Cube(solved_cube_str))
+
+    def test_anytime_unsolvable_cube(self):
+        for orig in TestSolver.unsolvable_cubes:
+            self.assertRaises(ValueError, rubik.anytime.solve, Cube(orig), timeout=1)
+
+
+class TestTables(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+
+    def test_write_and_open_table(self):
+        for data in (bytearray(b"\x00\x01\xff"), array("H", [0, 1, 0xffff]), array("I", [0, 1, 0xffffffff])):
+            path = os.path.join(self.dir, "t.tbl")
+            rubik.tables.write_table(path, data)
+            table = rubik.tables.open_table(path)
+            self.assertEqual(list(data), list(table))
+            self.assertRaises(TypeError, table.__setitem__, 0, 1)
+            rubik.tables.verify_table(path)
+
+    def test_open_invalid_table(self):
+        path = os.path.join(self.dir, "t.tbl")
+        with open(path, "wb") as f:
+            f.write(b"x" * 40)
+        self.assertRaises(ValueError, rubik.tables.open_table, path)
+
+        rubik.tables.write_table(path, array("H", range(10)))
+        with open(path, "r+b") as f:
+            f.seek(8)
+            f.write(b"\x63")
+        self.assertRaisesRegex(ValueError, "format version", rubik.tables.open_table, path)
+
+    def test_verify_corrupt_table(self):
+        path = os.path.join(self.dir, "t.tbl")
+        rubik.tables.write_table(path, bytearray(range(100)))
+        with open(path, "r+b") as f:
+            f.seek(50)
+            f.write(b"\xff")
+        self.assertRaisesRegex(ValueError, "checksum", rubik.tables.verify_table, path)
+
+    def test_load_builds_once(self):
+        calls = []
+
+        def build():
+            calls.append(1)
+            return array("H", range(1000))
+
+        self.addCleanup(rubik.tables._registry.pop, "test.table")
+        self.addCleanup(rubik.tables._loaded.pop, "test.table", None)
+        rubik.tables.register("test.table", build)
+        with mock.patch.dict(os.environ, {"RUBIK_TABLE_DIR": self.dir}):
+            self.assertEqual(list(range(1000)), list(rubik.tables.load("test.table")))
+            self.assertTrue(os.path.exists(rubik.tables.table_path("test.table")))
+            del rubik.tables._loaded["test.table"]
+            self.assertEqual(list(range(1000)), list(rubik.tables.load("test.table")))
+            self.assertIs(rubik.tables.load("test.table"), rubik.tables.load("test.table"))
+        self.assertEqual(1, len(calls))
+
+    def test_new_version_rebuilds(self):
+        self.addCleanup(rubik.tables._registry.pop, "test.table")
+        self.addCleanup(rubik.tables._loaded.pop, "test.table", None)
+        with mock.patch.dict(os.environ, {"RUBIK_TABLE_DIR": self.dir}):
+            rubik.tables.register("test.table", lambda: bytearray(b"\x01"))
+            self.assertEqual([1], list(rubik.tables.load("test.table")))
+            del rubik.tables._loaded["test.table"]
+            rubik.tables.register("test.table", lambda: bytearray(b"\x02"), version=2)
+            self.assertEqual([2], list(rubik.tables.load("test.table")))
+
+    def test_load_shipped_table(self):
+        self.addCleanup(rubik.tables._registry.pop, "test.table")
+        self.addCleanup(rubik.tables._loaded.pop, "test.table", None)
+        package_dir = os.path.join(self.dir, "package")
+        rubik.tables.register("test.table", mock.Mock(side_effect=AssertionError("built a shipped table")))
+        rubik.tables.write_table(rubik.tables.table_path("test.table", package_dir), bytearray(b"\x03"))
+        with mock.patch.object(rubik.tables, "PACKAGE_TABLE_DIR", package_dir), \
+                mock.patch.dict(os.environ, {"RUBIK_TABLE_DIR": os.path.join(self.dir, "user")}):
+            self.assertEqual([3], list(rubik.tables.load("test.table")))
+            self.assertFalse(os.path.exists(rubik.tables.table_path("test.table")))
+
+    def test_cli_uses_shipped_table(self):
+        out = io.StringIO()
+        with mock.patch.dict(os.environ, {"RUBIK_TABLE_DIR": self.dir}), contextlib.redirect_stdout(out):
+            self.assertEqual(0, rubik.tables.main(["verify", "solve.last_layer"]))
+            self.assertEqual(0, rubik.tables.main(["list", "solve.last_layer"]))
+            self.assertEqual(0, rubik.tables.main(["generate", "solve.last_layer"]))
+        shipped = rubik.tables.table_path("solve.last_layer", rubik.tables.PACKAGE_TABLE_DIR)
+        self.assertEqual([f"OK solve.last_layer: {shipped}", f"solve.last_layer: {shipped}",
+                          f"solve.last_layer: {shipped}"], out.getvalue().splitlines())
+        self.assertEqual([], os.listdir(self.dir))
+
+    def test_shipped_last_layer_table(self):
+        # fails when the build changes without a new version and a regenerated file
+        path = rubik.tables.table_path("solve.last_layer", rubik.tables.PACKAGE_TABLE_DIR)
+        rubik.tables.verify_table(path)
+        self.assertEqual(bytes(rubik.solve._last_layer_table()), bytes(rubik.tables.open_table(path)))
+
 
 class TestOptimize(unittest.TestCase):
 
@@ -734,5 +1570,123 @@ class TestOptimize(unittest.TestCase):
             self.assertEqual(str(c), str(d))
 
 
+    def test_optimize_cascades(self):
+        self.assertEqual([], optimize_moves(['R', 'U', 'Ui', 'Ri']))
+        self.assertEqual([], optimize_moves(['R', 'U', 'U', 'Ui', 'Ui', 'Ri']))
+        self.assertEqual(['F'], optimize_moves(['F', 'R', 'R', 'R', 'R']))
+        self.assertEqual(['Ri'], optimize_moves(['R', 'R', 'X', 'Xi', 'R']))
+
+    def test_optimize_commuting_moves(self):
+        self.assertEqual(['L'], optimize_moves(['R', 'L', 'Ri']))
+        self.assertEqual(['D', 'D'], optimize_moves(['U', 'D', 'D', 'Ui']))
+        self.assertEqual([], optimize_moves(['R', 'M', 'Li', 'Mi', 'Ri', 'L']))
+        self.assertEqual(['Fi', 'Bi', 'S'], optimize_moves(['S', 'B', 'Fi', 'B', 'B']))
+        # U does not commute with R or L
+        self.assertEqual(['R', 'U', 'L', 'Ui', 'Ri'], optimize_moves(['R', 'U', 'L', 'Ui', 'Ri']))
+        self.assertEqual(['L', 'R'], optimize_moves(['R', 'U', 'Ui', 'L']))
+
+    def test_optimize_never_longer_than_each_pass(self):
+        random.seed(1)
+        names = [name for pair in self.moves for name in pair]
+        for _ in range(500):
+            moves = [random.choice(names) for _ in range(random.randrange(30))]
+            passes = list(moves)
+            rubik.optimize.apply_no_full_cube_rotation_optimization(passes)
+            rubik.optimize.apply_repeat_three_optimization(passes)
+            rubik.optimize.apply_do_undo_optimization(passes)
+            actual = optimize_moves(moves)
+            self.assertLessEqual(len(actual), len(passes))
+
+            c, d = Cube(solved_cube_str), Cube(solved_cube_str)
+            c.sequence(" ".join(moves))
+            d.sequence(" ".join(actual))
+            self.assertEqual(str(c), str(d))
+
+    def test_optimize_long_sequence(self):
+        moves = ['R'] * 5000 + ['Ri'] * 5001
+        self.assertEqual(['Ri'], optimize_moves(moves))
+        moves = ['U', 'U'] * 5000
+        rubik.optimize.apply_repeat_three_optimization(moves)
+        rubik.optimize.apply_do_undo_optimization(moves)
+        self.assertEqual([], moves)
+
+    def test_iter_optimize_moves(self):
+        iter_optimize_moves = rubik.optimize.iter_optimize_moves
+        random.seed(3)
+        names = [name for pair in self.moves for name in pair] + ['_']
+        for _ in range(200):
+            moves = [random.choice(names) for _ in range(random.randrange(60))]
+            for metric in (rubik.optimize.QUARTER_TURN_METRIC, rubik.optimize.HALF_TURN_METRIC):
+                self.assertEqual(optimize_moves(moves, metric), list(iter_optimize_moves(iter(moves), metric)))
+
+        for orig in TestSolver.cubes[:5]:
+            solver = Solver(Cube(orig))
+            solver.solve()
+            self.assertEqual(optimize_moves(solver.moves), list(iter_optimize_moves(solver.moves, buffer=16)))
+
+    def test_iter_optimize_moves_is_lazy(self):
+        iter_optimize_moves = rubik.optimize.iter_optimize_moves
+        # moves are yielded before the end of an endless stream
+        moves = itertools.cycle(['R', 'U'])
+        self.assertEqual(['R', 'U', 'R', 'U'], list(itertools.islice(iter_optimize_moves(moves, buffer=8), 4)))
+        moves = itertools.cycle(['R', 'R', '_'])
+        self.assertEqual(['R', 'R', '_', 'R'], list(itertools.islice(iter_optimize_moves(moves, buffer=None), 4)))
+
+        # a cancellation can not reach moves that were already yielded
+        self.assertEqual(['R', 'Ri'], list(iter_optimize_moves(['R', 'U', 'Ui', 'Ri'], buffer=1)))
+        self.assertEqual([], list(iter_optimize_moves(['R', 'U', 'Ui', 'Ri'], buffer=2)))
+
+    def test_optimize_peephole(self):
+        htm = rubik.optimize.HALF_TURN_METRIC
+        moves = ['F2', 'U2', 'D2', 'F2', 'B2']
+        self.assertEqual(moves, optimize_moves(moves, htm))
+        actual = optimize_moves(moves, htm, peephole=True)
+        self.assertEqual(3, len(actual))
+        quarter_turns = optimize_moves(moves, peephole=True)
+        self.assertEqual(6, len(quarter_turns))
+        for result in (actual, quarter_turns):
+            c, d = Cube(solved_cube_str), Cube(solved_cube_str)
+            c.sequence(" ".join(moves))
+            d.sequence(" ".join(result))
+            self.assertEqual(str(c), str(d))
+
+        # names that are not moves end a run
+        moves = ['F2', 'U2', 'D2', '_', 'F2', 'B2']
+        self.assertFalse(rubik.optimize.apply_peephole_optimization(moves, htm))
+        self.assertEqual(['F2', 'U2', 'D2', '_', 'F2', 'B2'], moves)
+
+    def test_optimize_peephole_solutions(self):
+        for orig in TestSolver.cubes[:5]:
+            solver = Solver(Cube(orig))
+            solver.solve()
+            for metric in (rubik.optimize.QUARTER_TURN_METRIC, rubik.optimize.HALF_TURN_METRIC):
+                actual = optimize_moves(solver.moves, metric, peephole=True)
+                self.assertLessEqual(len(actual), len(optimize_moves(solver.moves, metric)))
+                c = Cube(orig)
+                c.sequence(" ".join(actual))
+                self.assertTrue(c.is_solved())
+
+    def test_optimize_half_turn_metric(self):
+        htm = rubik.optimize.HALF_TURN_METRIC
+        self.assertEqual(['R2', 'U'], optimize_moves(['R', 'R', 'U'], htm))
+        self.assertEqual(['R', 'R', 'U'], optimize_moves(['R2', 'U']))
+        self.assertEqual(['Ri'], optimize_moves(['R2', 'R'], htm))
+        self.assertEqual([], optimize_moves(["R'", 'R2', "R'"], htm))
+        self.assertEqual(['F2'], optimize_moves(['X', 'U2', 'Xi'], htm))
+        self.assertEqual(['Y2'], optimize_moves(['Z', 'X2', 'Zi'], htm))
+        self.assertEqual([], optimize_moves(['Z', 'X2', 'Zi', 'Y', 'Y'], htm))
+
+        random.seed(2)
+        names = [name for pair in self.moves for name in pair]
+        for _ in range(200):
+            moves = [random.choice(names) for _ in range(random.randrange(30))]
+            actual = optimize_moves(moves, htm)
+            self.assertLessEqual(len(actual), len(optimize_moves(moves)))
+            c, d = Cube(solved_cube_str), Cube(solved_cube_str)
+            c.sequence(" ".join(moves))
+            d.sequence(" ".join(actual))
+            self.assertEqual(str(c), str(d))
+
+
 if __name__ == '__main__':
     unittest.main()